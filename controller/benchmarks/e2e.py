@@ -0,0 +1,352 @@
+"""End-to-end workflow benchmark against the fake API server.
+
+Drives VisionModule.process_workflow with the mock GPIO, the synthetic
+camera and a fake pygame mixer that consumes audio at a fixed bitrate, for
+every combination of image size and network profile. Writes a JSON report
+keyed by commit so runs can be compared:
+
+    python -m benchmarks.e2e --output bench.json
+    python -m benchmarks.e2e --output after.json --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import queue
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import psutil
+
+NOEVENT, USEREVENT = 0, 32866
+
+class FakeMusic:
+    """pygame.mixer.music stand-in: reads the loaded source at the MP3
+    bitrate (times speed) on a thread, like SDL's decoder would, and posts
+    the end event when the source runs out."""
+
+    BYTES_PER_SECOND = 16000 # 128 kbit/s
+
+    def __init__(self, speed: float, events: queue.Queue):
+        self.speed = speed
+        self.events = events
+        self.end_event = None
+        self.source = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.paused = threading.Event()
+        self.played = 0
+
+    def set_endevent(self, event_type):
+        self.end_event = event_type
+
+    def load(self, source):
+        self.stop()
+        self.source = source
+        # SDL_mixer's probe on load: sniff the format, size the file and
+        # look for tags at its end, then rewind. A source that waits for
+        # the download on any of these delays playback just as it would
+        # with the real mixer.
+        source.read(12)
+        source.seek(-12, os.SEEK_CUR)
+        end = source.seek(0, os.SEEK_END)
+        for tail in (48, 128, 15):
+            if end >= tail:
+                source.seek(end - tail)
+                source.read(tail)
+        source.seek(0)
+        self.probe = source.read(4096) # Decoders sniff the header before playing
+
+    def play(self, start=0.0):
+        self.stopped.clear()
+        self.paused.clear()
+        self.played = len(self.probe)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        rate = self.BYTES_PER_SECOND * self.speed
+        while not self.stopped.is_set():
+            if self.paused.is_set():
+                time.sleep(0.01)
+                continue
+            chunk = self.source.read(4096)
+            if not chunk:
+                if self.end_event and not self.stopped.is_set():
+                    self.events.put(types.SimpleNamespace(type=self.end_event))
+                break
+            self.played += len(chunk)
+            self.stopped.wait(len(chunk) / rate)
+
+    def get_busy(self):
+        return self.thread is not None and self.thread.is_alive() and not self.paused.is_set()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join(1)
+            self.thread = None
+
+    def pause(self):
+        self.paused.set()
+
+    def unpause(self):
+        self.paused.clear()
+
+    def get_pos(self):
+        return int(self.played / self.BYTES_PER_SECOND * 1000)
+
+def install_fake_pygame(speed: float):
+    events = queue.Queue()
+
+    def wait(timeout=0):
+        try:
+            return events.get(timeout=timeout / 1000 if timeout else None)
+        except queue.Empty:
+            return types.SimpleNamespace(type=NOEVENT)
+
+    pygame = types.ModuleType("pygame")
+    pygame.NOEVENT, pygame.USEREVENT = NOEVENT, USEREVENT
+    pygame.mixer = types.SimpleNamespace(init=lambda *args, **kwargs: None, music=FakeMusic(speed, events))
+    pygame.display = types.SimpleNamespace(init=lambda: None)
+    pygame.event = types.SimpleNamespace(wait=wait)
+    sys.modules["pygame"] = pygame
+    return pygame
+
+class RssSampler:
+    """Peak resident memory while a workflow runs, sampled from a thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+
+    def __enter__(self):
+        self.baseline = self.peak = self.process.memory_info().rss
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+def start_fake_server(args, network):
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_server",
+        "--port", str(port),
+        "--network", network,
+        "--think-ms", str(args.think_ms),
+        "--first-byte-ms", str(args.first_byte_ms),
+        "--audio-seconds", str(args.audio_seconds),
+    ], stdout=subprocess.PIPE, text=True)
+    process.stdout.readline() # Listening banner
+    return process, f"http://127.0.0.1:{port}"
+
+def summarize(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "mean": round(statistics.mean(ordered), 1),
+        "p50": round(ordered[len(ordered) // 2], 1),
+        "max": round(ordered[-1], 1)
+    }
+
+async def run_scenario(args, base_url, width, height):
+    from core.manager import ModuleManager
+    from core.gpio import GPIO
+    from core.lazy import preload
+    from modules.camera import CameraModule
+    from modules.vision import VisionModule
+
+    workdir = tempfile.mkdtemp(prefix="vgas-bench-")
+    manager = ModuleManager()
+    manager.config.path = None # Never touch the real config.json
+    manager.config.update({
+        "api_key": "bench",
+        "base_url": base_url,
+        "active_prompt": "analyze",
+        "stream_audio": not args.no_stream,
+        "camera": {"backend": "synthetic", "resolution": [width, height], "fps": 5},
+        "cache": {"enabled": False}, # Synthetic pages look alike; every run must reach the server
+        "spool": {"enabled": False},
+    })
+    manager.runtime.configure({"image_pool": args.image_pool})
+    manager.runtime.start()
+    manager.response_cache.directory = os.path.join(workdir, "cache")
+    manager.spool.directory = os.path.join(workdir, "spool")
+    manager.notifications.directory = os.path.join(workdir, "logs")
+    manager.response_cache.configure({"enabled": False})
+    manager.spool.configure({"enabled": False})
+    await manager.http.start(base_url, warmup=True)
+    manager.loop_monitor.start()
+
+    camera = manager.modules["camera"] = CameraModule(manager)
+    camera.name = "camera"
+    vision = manager.modules["vision"] = VisionModule(manager)
+    vision.name = "vision"
+    await camera.start()
+    await vision.start()
+    station = vision.default_station
+    # Camera warm-up, connection warm-up and the lazy imports the manager preloads at boot
+    await asyncio.gather(manager.runtime.run("io", preload), manager.runtime.run("io", manager.runtime.warm))
+    await asyncio.sleep(1.0)
+
+    runs = []
+    for _ in range(args.runs):
+        known = {job.id for job in station.jobs}
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        with RssSampler() as rss:
+            if args.trigger == "gpio":
+                await asyncio.get_running_loop().run_in_executor(None, GPIO.press, station.BUTTON_PIN, 0.05)
+                while not [job for job in station.jobs if job.id not in known]:
+                    await asyncio.sleep(0.005)
+                job = [job for job in station.jobs if job.id not in known][0]
+                await job.done.wait()
+            else:
+                job = await station.process_workflow()
+        cycle_ms = (time.perf_counter() - started) * 1000
+        cpu_ms = (time.process_time() - cpu_started) * 1000
+
+        runs.append({
+            "state": job.state,
+            "time_to_first_audio_ms": job.time_to_first_audio,
+            "cycle_ms": round(cycle_ms, 1),
+            "cpu_ms": round(cpu_ms, 1),
+            "cpu_percent": round(cpu_ms / cycle_ms * 100, 1),
+            "peak_rss_mb": round(rss.peak / 2**20, 1),
+            "rss_growth_mb": round((rss.peak - rss.baseline) / 2**20, 1),
+            # What the controller itself reports for the workflow on /metrics
+            "workflow_peak_rss_mb": job.trace.summary()["peak_rss_mb"],
+            "upload_kb": job.frame["size"] // 1024 if job.frame else None,
+            "stages": {span["stage"]: span["duration_ms"] for span in job.trace.summary()["spans"]}
+        })
+        await asyncio.sleep(args.pause)
+
+    await vision.stop()
+    await camera.stop()
+    await manager.http.close()
+    manager.loop_monitor.uninstall()
+    manager.runtime.shutdown()
+
+    stages = sorted({stage for run in runs for stage in run["stages"]})
+    return {
+        "runs": runs,
+        "summary": {
+            "failures": sum(run["state"] != "done" for run in runs),
+            "time_to_first_audio_ms": summarize(run["time_to_first_audio_ms"] for run in runs),
+            "cycle_ms": summarize(run["cycle_ms"] for run in runs),
+            "cpu_ms": summarize(run["cpu_ms"] for run in runs),
+            "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+            "rss_growth_mb": summarize(run["rss_growth_mb"] for run in runs),
+            "assets": manager.assets.get_state(),
+            "loop_lag_p99_ms": manager.loop_monitor.get_state()["lag"]["p99_ms"],
+            "stages_p50_ms": {
+                stage: summarize(run["stages"].get(stage) for run in runs)["p50"] for stage in stages
+            }
+        }
+    }
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True).strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline):
+    print(f"\nCompared with {baseline['meta'].get('commit')}:")
+    previous = {(entry["image"], entry["network"]): entry["summary"] for entry in baseline["scenarios"]}
+    for entry in report["scenarios"]:
+        old = previous.get((entry["image"], entry["network"]))
+        if not old:
+            continue
+        parts = []
+        for metric in ("time_to_first_audio_ms", "cycle_ms", "cpu_ms", "rss_growth_mb"):
+            if entry["summary"].get(metric) and old.get(metric) and old[metric]["p50"]:
+                before, after = old[metric]["p50"], entry["summary"][metric]["p50"]
+                parts.append(f"{metric} {before} -> {after} ({(after - before) / before * 100:+.1f}%)")
+        print(f"  {entry['image']} / {entry['network']}: " + ", ".join(parts))
+
+async def run(args):
+    report = {
+        "meta": {
+            "commit": git_revision(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": vars(args)
+        },
+        "scenarios": []
+    }
+    for network in args.networks.split(","):
+        server, base_url = start_fake_server(args, network)
+        try:
+            for size in args.sizes.split(","):
+                width, height = (int(part) for part in size.split("x"))
+                print(f"{size} over {network}...", flush=True)
+                result = await run_scenario(args, base_url, width, height)
+                summary = result["summary"]
+                print(
+                    f"  TTFA p50 {summary['time_to_first_audio_ms'] and summary['time_to_first_audio_ms']['p50']} ms, "
+                    f"cycle p50 {summary['cycle_ms']['p50']} ms, cpu p50 {summary['cpu_ms']['p50']} ms, "
+                    f"peak RSS {summary['peak_rss_mb']} MB, failures {summary['failures']}"
+                )
+                report["scenarios"].append({"image": size, "network": network, **result})
+        finally:
+            server.terminate()
+            server.wait()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1280x960,2028x1520,4056x3040")
+    parser.add_argument("--networks", default="lan,wifi,4g")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--think-ms", type=float, default=800)
+    parser.add_argument("--first-byte-ms", type=float, default=250)
+    parser.add_argument("--audio-seconds", type=float, default=6.0)
+    parser.add_argument("--playback-speed", type=float, default=10.0, help="fake mixer speed-up over real time")
+    parser.add_argument("--pause", type=float, default=0.2, help="seconds between workflows")
+    parser.add_argument("--trigger", choices=["call", "gpio"], default="call", help="call process_workflow or press the mock button")
+    parser.add_argument("--image-pool", choices=["thread", "process"], default="thread", help="executor kind for capture scoring and encoding")
+    parser.add_argument("--no-stream", action="store_true", help="download the whole answer before playing")
+    parser.add_argument("--output", default="bench-report.json")
+    parser.add_argument("--compare", help="earlier report to diff against")
+    args = parser.parse_args()
+
+    install_fake_pygame(args.playback_speed)
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Stand-in for the web API with controllable latency and bandwidth.
+
+Serves /api/analyze (streamed MP3), /api/analyze/cancel and /api/version
+over plain HTTP/1.1 with keep-alive, so the controller's pooled client
+talks to it exactly as it would to the real server. Run it on its own to
+point a dashboard at it:
+
+    python -m benchmarks.fake_server --port 8765 --network wifi --think-ms 1500
+"""
+import argparse
+import asyncio
+import json
+import random
+from urllib.parse import parse_qs, urlsplit
+
+# Bandwidth in kbit/s and round trip time in ms
+NETWORK_PROFILES = {
+    "lan": {"upload_kbps": 100000, "download_kbps": 100000, "rtt_ms": 1},
+    "wifi": {"upload_kbps": 10000, "download_kbps": 20000, "rtt_ms": 15},
+    "4g": {"upload_kbps": 3000, "download_kbps": 10000, "rtt_ms": 60},
+    "3g": {"upload_kbps": 500, "download_kbps": 1500, "rtt_ms": 200},
+}
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz: 417 byte frames, ~38.3 per second
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+MP3_FRAMES_PER_SECOND = 44100 / 1152
+
+def fake_mp3(seconds: float):
+    return MP3_FRAME * max(1, int(seconds * MP3_FRAMES_PER_SECOND))
+
+class FakeApiServer:
+    def __init__(self, network="lan", think_ms=1500, first_byte_ms=300, audio_seconds=8.0,
+                 error_rate=0.0, version="1.2.4"):
+        self.network = NETWORK_PROFILES[network]
+        self.think_ms = think_ms
+        self.first_byte_ms = first_byte_ms
+        self.audio = fake_mp3(audio_seconds)
+        self.error_rate = error_rate
+        self.version = version
+        self.cancelled = {} # request id -> asyncio.Event
+        self.stats = {"analyze": 0, "cancel": 0, "version": 0, "errors": 0}
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    def bytes_per_second(self, direction):
+        return self.network[f"{direction}_kbps"] * 1000 / 8
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await self.read_body(reader, int(headers.get("content-length", 0)))
+                url = urlsplit(target)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                await asyncio.sleep(self.network["rtt_ms"] / 2000)
+
+                if url.path == "/api/analyze" and method == "POST":
+                    await self.analyze(writer, query, body)
+                elif url.path == "/api/analyze/cancel" and method == "POST":
+                    self.stats["cancel"] += 1
+                    event = self.cancelled.get(query.get("id"))
+                    if event:
+                        event.set()
+                    await self.send_json(writer, 200, {"success": True, "cancelled": bool(event)})
+                elif url.path == "/api/version":
+                    self.stats["version"] += 1
+                    await self.send_json(writer, 200, {"version": self.version, "changelog": []})
+                else:
+                    await self.send_json(writer, 404, {"message": "Not found"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_body(self, reader, length):
+        """Reads the upload no faster than the profile's uplink allows.
+
+        Loopback socket buffers absorb a whole JPEG, so on the client this
+        time shows up in the analysis span rather than the upload span."""
+        chunks = []
+        remaining = length
+        rate = self.bytes_per_second("upload")
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, 16384))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"".join(chunks), length)
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            await asyncio.sleep(len(chunk) / rate)
+        return b"".join(chunks)
+
+    async def analyze(self, writer, query, body):
+        self.stats["analyze"] += 1
+        if not query.get("id") or not body:
+            return await self.send_json(writer, 400, {"message": "Missing request ID or image"})
+        if random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return await self.send_json(writer, 503, {"message": "Injected failure"})
+
+        cancelled = self.cancelled[query["id"]] = asyncio.Event()
+        try:
+            # Model "thinking"; a cancel request ends it early like the real server
+            try:
+                await asyncio.wait_for(cancelled.wait(), self.think_ms / 1000)
+                return await self.send_json(writer, 499, {"message": "Request Aborted"})
+            except asyncio.TimeoutError:
+                pass
+
+            await asyncio.sleep(self.network["rtt_ms"] / 2000)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: audio/mpeg\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+            await writer.drain()
+            await asyncio.sleep(self.first_byte_ms / 1000) # TTS first byte
+
+            rate = self.bytes_per_second("download")
+            for offset in range(0, len(self.audio), 4096):
+                if cancelled.is_set():
+                    break
+                chunk = self.audio[offset:offset + 4096]
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                await writer.drain()
+                await asyncio.sleep(len(chunk) / rate)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            self.cancelled.pop(query["id"], None)
+
+    async def send_json(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 499: "Client Closed Request",
+                  503: "Service Unavailable"}.get(status, "Status")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+async def serve(args):
+    server = FakeApiServer(
+        network=args.network,
+        think_ms=args.think_ms,
+        first_byte_ms=args.first_byte_ms,
+        audio_seconds=args.audio_seconds,
+        error_rate=args.error_rate
+    )
+    await server.start(args.host, args.port)
+    print(f"Fake API listening on http://{args.host}:{args.port} ({args.network})", flush=True)
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--network", choices=sorted(NETWORK_PROFILES), default="lan")
+    parser.add_argument("--think-ms", type=float, default=1500)
+    parser.add_argument("--first-byte-ms", type=float, default=300)
+    parser.add_argument("--audio-seconds", type=float, default=8.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of analyze calls answered with 503")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Times burst scoring on camera-sized frames.
+
+Run from the controller directory:
+
+    python -m benchmarks.frame_quality --frames 3 --rounds 20
+
+On a Pi the whole burst should score in a few tens of milliseconds. The
+run also checks that blurred and overexposed frames lose to a sharp one.
+"""
+import argparse
+import statistics
+import sys
+import time
+from PIL import ImageFilter, ImageEnhance
+
+from core.camera import SyntheticBackend
+from core.quality import DEFAULT_QUALITY, pick_best_frame, score_frame
+
+def make_burst(width, height, count):
+    """One sharp frame followed by progressively blurrier ones"""
+    camera = SyntheticBackend({"resolution": [width, height]})
+    camera.open()
+    sharp = camera.read()
+    burst = [sharp]
+    for index in range(1, count):
+        burst.append(sharp.filter(ImageFilter.GaussianBlur(radius=2 * index)))
+    return burst
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=2028)
+    parser.add_argument("--height", type=int, default=1520)
+    parser.add_argument("--frames", type=int, default=DEFAULT_QUALITY["burst_size"])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="fail if p95 per burst exceeds this")
+    args = parser.parse_args()
+
+    burst = make_burst(args.width, args.height, max(1, args.frames))
+    pick_best_frame(burst) # Warm up numpy and Pillow code paths
+
+    timings = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        best, scores = pick_best_frame(burst)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(f"{len(burst)} frames of {args.width}x{args.height}, {args.rounds} rounds")
+    print(f"  per burst: mean {statistics.mean(timings):.1f} ms, p95 {percentile(timings, 0.95):.1f} ms")
+    print(f"  per frame: mean {statistics.mean(timings) / len(burst):.1f} ms")
+    for index, score in enumerate(scores):
+        print(f"  frame {index}: sharpness {score['sharpness']}, clipped {score['clipped']}, {score['reason'] or 'ok'}")
+
+    failures = []
+    if best != 0:
+        failures.append(f"expected the sharp frame to win, got frame {best}")
+    washed_out = ImageEnhance.Brightness(burst[0]).enhance(4.0)
+    if score_frame(washed_out)["ok"]:
+        failures.append("overexposed frame was accepted")
+    if percentile(timings, 0.95) > args.budget_ms:
+        failures.append(f"p95 {percentile(timings, 0.95):.1f} ms is over the {args.budget_ms} ms budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Streams an answer into the real pygame mixer (SDL dummy audio driver).
+
+The e2e benchmark drives a fake mixer; this checks the part it cannot:
+that SDL_mixer's probing on load (seek to the end, tag reads) does not
+wait for the download, so playback starts once the prebuffer is in.
+Exits with status 1 if playback started late or did not play through:
+
+    python -m benchmarks.real_mixer --audio-seconds 4 --download-seconds 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.fake_server import fake_mp3
+
+async def run(args, content_length: bool):
+    from core.audio_engine import AudioEngine
+    from core.audio_stream import AudioStreamBuffer
+    from core.runtime import ModuleRuntime
+
+    runtime = ModuleRuntime()
+    runtime.start()
+    engine = AudioEngine(runtime)
+    await engine.start()
+    if not engine.available:
+        runtime.shutdown()
+        raise SystemExit("pygame mixer unavailable")
+
+    data = fake_mp3(args.audio_seconds)
+    buffer = AudioStreamBuffer(args.prebuffer_kb * 1024)
+    if content_length:
+        buffer.expected_size = len(data)
+    chunk = 4096
+    delay = args.download_seconds / (len(data) / chunk)
+
+    async def download():
+        for offset in range(0, len(data), chunk):
+            buffer.append(data[offset:offset + chunk])
+            await asyncio.sleep(delay)
+        buffer.finish()
+
+    started = time.monotonic()
+    feeder = asyncio.create_task(download())
+    await buffer.ready.wait()
+    ready = time.monotonic() - started
+    played = await engine.play(buffer)
+    playing = time.monotonic() - started
+    await engine.wait()
+    ended = time.monotonic() - started
+    await feeder
+    engine.close()
+    runtime.shutdown()
+    return {
+        "content_length": content_length,
+        "played": played,
+        "prebuffered_s": round(ready, 2),
+        "playing_s": round(playing, 2),
+        "ended_s": round(ended, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio-seconds", type=float, default=4.0)
+    parser.add_argument("--download-seconds", type=float, default=2.0)
+    parser.add_argument("--prebuffer-kb", type=int, default=32)
+    parser.add_argument("--slack-ms", type=float, default=250, help="allowed delay from prebuffer to playback")
+    args = parser.parse_args()
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    ok = True
+    for content_length in (False, True):
+        result = asyncio.run(run(args, content_length))
+        late = result["playing_s"] - result["prebuffered_s"] > args.slack_ms / 1000
+        short = result["ended_s"] < args.audio_seconds * 0.9
+        ok = ok and result["played"] and not late and not short
+        print(
+            f"content-length {'yes' if content_length else 'no '}: prebuffer {result['prebuffered_s']} s, "
+            f"playing {result['playing_s']} s, ended {result['ended_s']} s "
+            f"(download {args.download_seconds} s, audio {args.audio_seconds} s)"
+            f"{'  <- started late' if late else ''}{'  <- cut short' if short else ''}"
+        )
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Multi-station capacity benchmark against the fake API server.
+
+Runs one controller with N stations, each with its own synthetic camera,
+button and a player-process audio sink, for every N in --stations. Every
+station is a closed loop: press, wait for the answer to finish speaking,
+pause for --gap seconds (exponentially distributed), press again. Each
+level runs in a fresh process, so its peak RSS is not inflated by the
+levels before it. A level is sustainable when nothing fails, p95 time to
+first audio stays within --ttfa-budget-ms, loop lag p99 within
+--lag-budget-ms and peak RSS within --rss-budget-mb:
+
+    python -m benchmarks.stations --stations 1,2,4,8 --output bench-report-stations.json
+"""
+import argparse
+import asyncio
+import multiprocessing
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import psutil
+
+from benchmarks.e2e import RssSampler, git_revision, start_fake_server
+
+# Reads MP3 from stdin at 128 kbit/s times the speed-up, like mpg123 would play it
+FAKE_PLAYER = (
+    "import sys, time\n"
+    "rate = 16000 * float(sys.argv[1])\n"
+    "while True:\n"
+    "    chunk = sys.stdin.buffer.read(4096)\n"
+    "    if not chunk: break\n"
+    "    time.sleep(len(chunk) / rate)\n"
+)
+
+def percentile(values, fraction):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 1)
+
+async def drive_station(station, until, gap, jobs):
+    """Presses the station's button again a while after each answer"""
+    await asyncio.sleep(random.uniform(0, gap)) # Desks do not start in lockstep
+    while time.monotonic() < until:
+        job = await station.process_workflow()
+        if job:
+            jobs.append((station.id, job))
+        await asyncio.sleep(random.expovariate(1 / gap) if gap else 0)
+
+async def run_level(args, base_url, count):
+    from core.manager import ModuleManager
+    from core.metrics import Histogram
+    from modules.camera import CameraModule
+    from modules.vision import VisionModule
+
+    width, height = (int(part) for part in args.resolution.split("x"))
+    workdir = tempfile.mkdtemp(prefix="vgas-stations-")
+    player = [sys.executable, "-S", "-c", FAKE_PLAYER, str(args.playback_speed)]
+    manager = ModuleManager()
+    manager.config.path = None
+    manager.config.update({
+        "api_key": "bench",
+        "base_url": base_url,
+        "active_prompt": "analyze",
+        "camera": {"backend": "synthetic", "resolution": [width, height], "fps": args.fps},
+        "cameras": {f"cam{index}": {} for index in range(1, count + 1)},
+        "stations": [
+            {
+                "id": f"desk{index}",
+                "button_pin": 100 + index,
+                "camera": f"cam{index}",
+                "audio": {"sink": "process", "command": player}
+            }
+            for index in range(1, count + 1)
+        ],
+        "cache": {"enabled": False},
+        "spool": {"enabled": False},
+        "notifications": {"persist": False},
+    })
+    manager.runtime.configure({"image_pool": args.image_pool})
+    manager.runtime.start()
+    manager.response_cache.directory = os.path.join(workdir, "cache")
+    manager.spool.directory = os.path.join(workdir, "spool")
+    manager.response_cache.configure({"enabled": False})
+    manager.spool.configure({"enabled": False})
+    manager.notifications.configure({"persist": False})
+    await manager.http.start(base_url, warmup=True)
+    manager.loop_monitor.configure({"interval": 0.1})
+    manager.loop_monitor.start()
+
+    camera = manager.modules["camera"] = CameraModule(manager)
+    camera.name = "camera"
+    vision = manager.modules["vision"] = VisionModule(manager)
+    vision.name = "vision"
+    await camera.start()
+    await vision.start()
+    await asyncio.gather(manager.runtime.run("io", manager.runtime.warm))
+    await asyncio.sleep(1.0)
+    manager.loop_monitor.lag = Histogram() # Only the measured window counts
+
+    process = psutil.Process()
+    jobs = []
+    cpu_started = process.cpu_times()
+    started = time.monotonic()
+    with RssSampler(interval=0.05) as rss:
+        until = started + args.duration
+        await asyncio.gather(*(drive_station(station, until, args.gap, jobs) for station in vision.stations.values()))
+    elapsed = time.monotonic() - started
+    cpu = process.cpu_times()
+    # Player processes have exited and been reaped, so they show up as children
+    controller_cpu = (cpu.user + cpu.system) - (cpu_started.user + cpu_started.system)
+    player_cpu = (cpu.children_user + cpu.children_system) - (cpu_started.children_user + cpu_started.children_system)
+
+    lag = manager.loop_monitor.get_state()["lag"]
+    await vision.stop()
+    await camera.stop()
+    await manager.spool.stop()
+    await manager.http.close()
+    manager.loop_monitor.uninstall()
+    manager.runtime.shutdown()
+
+    ttfa = [job.time_to_first_audio for _, job in jobs]
+    cycles = [job.trace.summary()["total_ms"] for _, job in jobs]
+    summary = {
+        "stations": count,
+        "workflows": len(jobs),
+        "failures": sum(job.state != "done" for _, job in jobs),
+        "workflows_per_minute": round(len(jobs) / elapsed * 60, 1),
+        "time_to_first_audio_ms": {"p50": percentile(ttfa, 0.5), "p95": percentile(ttfa, 0.95)},
+        "cycle_ms": {"p50": percentile(cycles, 0.5), "p95": percentile(cycles, 0.95)},
+        "loop_lag_p99_ms": lag["p99_ms"],
+        "controller_cpu_percent": round(controller_cpu / elapsed * 100, 1),
+        "player_cpu_percent": round(player_cpu / elapsed * 100, 1),
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        "rss_growth_mb": round((rss.peak - rss.baseline) / 2**20, 1),
+    }
+    summary["sustainable"] = (
+        summary["failures"] == 0
+        and summary["workflows"] > 0
+        and (summary["time_to_first_audio_ms"]["p95"] or 0) <= args.ttfa_budget_ms
+        and (lag["p99_ms"] or 0) <= args.lag_budget_ms
+        and summary["peak_rss_mb"] <= args.rss_budget_mb
+    )
+    return summary
+
+def run_level_process(args, base_url, count):
+    """Entry point of the fresh process each level runs in"""
+    return asyncio.run(run_level(args, base_url, count))
+
+async def run(args):
+    report = {
+        "meta": {
+            "commit": git_revision(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": vars(args)
+        },
+        "levels": []
+    }
+    server, base_url = start_fake_server(args, args.network)
+    try:
+        for count in (int(part) for part in args.stations.split(",")):
+            print(f"{count} station(s) for {args.duration}s...", flush=True)
+            # Spawned rather than forked: nothing of the previous level's heap carries over
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                summary = await asyncio.wrap_future(pool.submit(run_level_process, args, base_url, count))
+            print(
+                f"  {summary['workflows']} workflows ({summary['failures']} failed), "
+                f"TTFA p50/p95 {summary['time_to_first_audio_ms']['p50']}/{summary['time_to_first_audio_ms']['p95']} ms, "
+                f"lag p99 {summary['loop_lag_p99_ms']} ms, cpu {summary['controller_cpu_percent']}% "
+                f"+ players {summary['player_cpu_percent']}%, peak RSS {summary['peak_rss_mb']} MB"
+                f"{'' if summary['sustainable'] else '  <- over budget'}"
+            )
+            report["levels"].append(summary)
+    finally:
+        server.terminate()
+        server.wait()
+    sustainable = [level["stations"] for level in report["levels"] if level["sustainable"]]
+    report["max_sustainable_stations"] = max(sustainable) if sustainable else 0
+    print(f"Sustainable: up to {report['max_sustainable_stations']} station(s)")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", default="1,2,4,8")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument("--gap", type=float, default=3.0, help="mean seconds between an answer and the next press")
+    parser.add_argument("--resolution", default="2028x1520")
+    parser.add_argument("--fps", type=float, default=2)
+    parser.add_argument("--network", default="wifi")
+    parser.add_argument("--think-ms", type=float, default=800)
+    parser.add_argument("--first-byte-ms", type=float, default=250)
+    parser.add_argument("--audio-seconds", type=float, default=6.0)
+    parser.add_argument("--playback-speed", type=float, default=4.0, help="fake player speed-up over real time")
+    parser.add_argument("--image-pool", choices=["thread", "process"], default="thread")
+    parser.add_argument("--ttfa-budget-ms", type=float, default=3000)
+    parser.add_argument("--lag-budget-ms", type=float, default=100)
+    parser.add_argument("--rss-budget-mb", type=float, default=400, help="controller peak RSS per level")
+    parser.add_argument("--output", default="bench-report-stations.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import mmap
+import tempfile
+import time
+from collections import OrderedDict
+from core.config_store import merge_settings
+
+class AssetStore:
+    """Content-addressed store for workflow images and audio.
+
+    Status messages only carry the asset ID; the dashboard fetches the bytes
+    once from /assets/{id}. IDs are derived from the content, so they double
+    as strong ETags.
+
+    Assets are kept as raw bytes and handed out as read-only memoryviews, so
+    serving, playing or caching one never copies it. Resident bytes are held
+    under memory_budget_kb: past it the oldest assets are written to an
+    unlinked temp file and memory-mapped, which leaves their pages to the
+    page cache. Base64 is only produced when a client asks for it.
+
+    Past max_spill_mb the oldest spilled assets are dropped, except pinned
+    ones: a queued or playing job pins its image and answer until it ends,
+    so the player never finds its audio gone.
+    """
+
+    DEFAULTS = {
+        "memory_budget_kb": 4096, # resident asset bytes before the oldest spill to disk
+        "max_spill_mb": 64,       # spilled bytes before the oldest assets are dropped
+        "spill_dir": None,        # None for the system temp dir; must not be a tmpfs
+    }
+
+    def __init__(self):
+        self.settings = dict(self.DEFAULTS)
+        self.assets = OrderedDict() # id -> asset, oldest first
+        self.resident = 0 # bytes held in memory
+        self.spilled = 0  # bytes held in mapped files
+        self.spills = 0
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "assets")
+        self.enforce()
+
+    def put(self, data, media_type: str, pin: bool = False):
+        """Stores bytes, a bytearray or a memoryview without copying it.
+
+        The caller must not modify the buffer afterwards. Memory is only
+        released by spilling once the caller has dropped its own reference.
+        With pin the asset is kept until a matching unpin()."""
+        view = memoryview(data).toreadonly()
+        asset_id = hashlib.sha256(view).hexdigest()[:20]
+        if asset_id in self.assets:
+            self.assets.move_to_end(asset_id)
+            if pin:
+                self.assets[asset_id]["pins"] += 1
+            return asset_id
+
+        self.assets[asset_id] = {
+            "data": view,
+            "media_type": media_type,
+            "size": view.nbytes,
+            "spilled": False,
+            "pins": 1 if pin else 0,
+            "created": time.time()
+        }
+        self.resident += view.nbytes
+        self.enforce()
+        return asset_id
+
+    def get(self, asset_id: str):
+        return self.assets.get(asset_id)
+
+    def view(self, asset_id: str):
+        """Read-only memoryview of the content, or None if it has been dropped"""
+        asset = self.assets.get(asset_id)
+        return asset["data"] if asset else None
+
+    def unpin(self, asset_id: str):
+        asset = self.assets.get(asset_id)
+        if asset and asset["pins"]:
+            asset["pins"] -= 1
+            if not asset["pins"]:
+                self.enforce() # It may have been held over the spill limit
+
+    def base64(self, asset_id: str):
+        asset = self.assets.get(asset_id)
+        return base64.b64encode(asset["data"]).decode("ascii") if asset else None
+
+    def enforce(self):
+        budget = self.settings["memory_budget_kb"] * 1024
+        for asset_id, asset in list(self.assets.items()):
+            if self.resident <= budget:
+                break
+            if not asset["spilled"] and asset["size"] and not self.spill(asset) and not asset["pins"]:
+                self.drop(asset_id) # Cannot spill it; memory is the harder limit
+
+        # Pinned assets are never dropped, even if that holds more than max_spill_mb
+        max_spill = self.settings["max_spill_mb"] * 1024 * 1024
+        for asset_id, asset in list(self.assets.items()):
+            if self.spilled <= max_spill:
+                break
+            if asset["spilled"] and not asset["pins"]:
+                self.drop(asset_id)
+
+    def spill(self, asset):
+        # Writes land in the page cache, so this is quick enough for the loop
+        try:
+            with tempfile.TemporaryFile(prefix="asset-", dir=self.settings["spill_dir"]) as f:
+                f.write(asset["data"])
+                f.flush()
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            print(f"Asset spill failed for {asset['size'] // 1024} KB: {e}")
+            return False
+        # Views already handed out keep the old bytes alive until they are released
+        asset["data"] = memoryview(mapped)
+        asset["spilled"] = True
+        self.resident -= asset["size"]
+        self.spilled += asset["size"]
+        self.spills += 1
+        return True
+
+    def drop(self, asset_id: str):
+        # Mapped files are unmapped once the last view of them is gone
+        asset = self.assets.pop(asset_id)
+        if asset["spilled"]:
+            self.spilled -= asset["size"]
+        else:
+            self.resident -= asset["size"]
+
+    def get_state(self):
+        return {
+            "count": len(self.assets),
+            "pinned": sum(1 for asset in self.assets.values() if asset["pins"]),
+            "resident_kb": self.resident // 1024,
+            "spilled_kb": self.spilled // 1024,
+            "budget_kb": self.settings["memory_budget_kb"],
+            "spills": self.spills
+        }
+
+def parse_range(header: str, size: int):
+    """Parses a single 'bytes=start-end' range. Returns (start, end) inclusive,
+    None when the header should be ignored, or raises ValueError if unsatisfiable."""
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        # Multipart ranges are not worth it for our assets, send the full body
+        return None
+
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if not start_text:
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            return max(0, size - length), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"Malformed range: {header}")
+
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
@@ -0,0 +1,396 @@
+import asyncio
+import os
+import signal
+import subprocess
+import threading
+import time
+from core.audio_stream import AudioStreamBuffer
+from core.lazy import module_available
+from core.config_store import merge_settings
+
+HAS_PYGAME = module_available("pygame")
+
+# kbit/s by [MPEG-1?][layer]; index 0 is "free", 15 is invalid
+BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def parse_frame_header(header: bytes):
+    """(frame length in bytes, samples, sample rate) of an MPEG audio frame header, or None"""
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03   # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if mpeg1 or layer == 2 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+class Mp3Index:
+    """Byte offset and start time of every complete frame seen so far.
+
+    Built incrementally as the answer downloads, so a seek can reopen the
+    stream exactly on a frame boundary and know the time it starts at.
+    Frames are 1152 samples (26 ms at 44.1 kHz), the finest point an MP3
+    decoder can start from.
+    """
+
+    def __init__(self):
+        self.offsets = [] # byte offset of each frame
+        self.times = []   # start time of each frame, seconds
+        self.scanned = 0  # bytes examined so far
+        self.duration = 0.0
+
+    def update(self, data):
+        position = self.scanned
+        if position == 0 and data[:3] == b"ID3" and len(data) >= 10:
+            # ID3v2 tag: 10 byte header plus a syncsafe size
+            size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+            position = 10 + size
+        while position + 4 <= len(data):
+            frame = parse_frame_header(data[position:position + 4])
+            if frame is None:
+                position += 1 # Lost sync (junk or a tag); look for the next header
+                continue
+            length, samples, sample_rate = frame
+            if position + length > len(data):
+                break # Incomplete frame, wait for more data
+            self.offsets.append(position)
+            self.times.append(self.duration)
+            self.duration += samples / sample_rate
+            position += length
+        self.scanned = position
+
+    def locate(self, seconds: float):
+        """(byte offset, start time) of the frame playing at seconds"""
+        if not self.offsets:
+            return 0, 0.0
+        low, high = 0, len(self.times) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.times[middle] <= seconds:
+                low = middle
+            else:
+                high = middle - 1
+        return self.offsets[low], self.times[low]
+
+class PlayerProcess:
+    """pygame.mixer.music-like sink that pipes MP3 into an external player.
+
+    Each station can drive its own output device this way, e.g.
+    ["mpg123", "-q", "-a", "hw:1,0", "-"]; the pygame mixer exists only
+    once per process. play() starts the player and a thread that copies
+    the loaded stream to its stdin. Pause stops the process with SIGSTOP.
+    The position is wall time since play() minus paused time, so it runs
+    ahead of the speaker by whatever the player buffers.
+    """
+
+    def __init__(self, command, on_end):
+        self.command = command
+        self.on_end = on_end # called from the feeder thread when a track plays out
+        self.reader = None
+        self.process = None
+        self.generation = 0  # bumped by stop() so an old feeder stays quiet
+        self.started = None
+        self.paused_at = None
+        self.paused_total = 0.0
+
+    def load(self, reader):
+        self.stop()
+        self.reader = reader
+
+    def play(self):
+        self.stop()
+        self.generation += 1
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.started, self.paused_at, self.paused_total = time.monotonic(), None, 0.0
+        threading.Thread(target=self.feed, args=(self.process, self.reader, self.generation), name="audio-feed", daemon=True).start()
+
+    def feed(self, process, reader, generation):
+        try:
+            while True:
+                chunk = reader.read(16384)
+                if not chunk:
+                    break
+                process.stdin.write(chunk)
+            process.stdin.close()
+        except (OSError, ValueError):
+            pass # Player killed by stop(), or exited on its own
+        process.wait()
+        if generation == self.generation:
+            self.on_end()
+
+    def pause(self):
+        if self.get_busy():
+            self.process.send_signal(signal.SIGSTOP)
+            self.paused_at = time.monotonic()
+
+    def unpause(self):
+        if self.paused_at is not None and self.process:
+            self.process.send_signal(signal.SIGCONT)
+            self.paused_total += time.monotonic() - self.paused_at
+            self.paused_at = None
+
+    def stop(self):
+        process, self.process = self.process, None
+        self.generation += 1
+        if process and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def get_busy(self):
+        return bool(self.process and self.process.poll() is None and self.paused_at is None)
+
+    def get_pos(self):
+        if not self.process:
+            return -1
+        now = self.paused_at if self.paused_at is not None else time.monotonic()
+        return int((now - self.started - self.paused_total) * 1000)
+
+class AudioEngine:
+    """Plays answers through pygame.mixer.music and keeps the real position.
+
+    The end of a track is signalled by pygame's end event, delivered by a
+    thread that sleeps in pygame.event.wait(), rather than by polling
+    get_busy(). get_pos() only counts time since the last play() call, so
+    every play and seek reopens the stream at a frame boundary and records
+    the time that frame starts at; the position is that offset plus get_pos().
+    All mixer calls run on the runtime's single "audio" thread.
+
+    The sink is chosen at start: "pygame" (one per process), "process" for
+    an external player per station, or "none" to leave answers on the
+    dashboard only.
+    """
+
+    DEFAULTS = {
+        "sink": "pygame",                 # pygame, process or none
+        "command": ["mpg123", "-q", "-"], # process sink: reads MP3 on stdin
+        "seek_step": 10.0,          # seconds skipped by audio_forward / audio_backward
+        "position_interval": 0.5,   # seconds between position updates while playing
+    }
+
+    def __init__(self, runtime, on_update=None):
+        self.runtime = runtime
+        self.on_update = on_update # async (state), throttled while playing
+        self.settings = dict(self.DEFAULTS)
+        self.music = None
+        self.end_event = None
+        self.events = False # True once end events are being delivered
+        self.loop = None
+        self.source = None  # AudioStreamBuffer being played
+        self.reader = None  # AudioStreamReader currently loaded in the mixer
+        self.index = Mp3Index()
+        self.offset = 0.0   # track time at which the current reader starts
+        self.state = "idle" # idle, loading, playing, paused
+        self.ended = None   # asyncio.Event set when the track ends or is stopped
+        self.ticker = None
+        self.closing = threading.Event()
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "audio")
+
+    @property
+    def available(self):
+        return self.music is not None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        sink = self.settings["sink"]
+        if sink == "pygame":
+            self.music = await self.runtime.run("audio", self.init_mixer)
+            if self.music:
+                threading.Thread(target=self.watch_events, name="audio-events", daemon=True).start()
+        elif sink == "process":
+            self.music = PlayerProcess(self.settings["command"], lambda: self.loop.call_soon_threadsafe(self.on_end_event))
+            self.events = True
+
+    def init_mixer(self):
+        """Blocking: importing pygame and opening the audio device take a while"""
+        if not HAS_PYGAME:
+            return None
+        # Events need SDL's video subsystem; never let it grab a real display
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        try:
+            import pygame
+            pygame.mixer.init()
+            self.end_event = pygame.USEREVENT + 1
+            pygame.mixer.music.set_endevent(self.end_event)
+            return pygame.mixer.music
+        except Exception as e:
+            print(f"Audio mixer unavailable: {e}")
+            return None
+
+    def watch_events(self):
+        import pygame
+        try:
+            # Video and event handling stay on this thread
+            pygame.display.init()
+        except Exception as e:
+            print(f"Audio end events unavailable, falling back to polling: {e}")
+            return
+        self.events = True
+        while not self.closing.is_set():
+            event = pygame.event.wait(250) # Sleeps in SDL; the timeout only bounds shutdown
+            if event.type == self.end_event:
+                self.loop.call_soon_threadsafe(self.on_end_event)
+
+    def on_end_event(self):
+        # Reloading for a seek can also end the old track; only a mixer
+        # that really went quiet while we think it plays means the end
+        if self.state == "playing" and not self.music.get_busy():
+            self.finish()
+
+    @property
+    def position(self):
+        if self.state == "idle" or not self.music:
+            return 0.0
+        elapsed = self.music.get_pos()
+        return self.offset + max(0, elapsed) / 1000
+
+    @property
+    def buffered(self):
+        if self.source:
+            self.index.update(self.source.data)
+        return self.index.duration
+
+    def get_state(self):
+        buffered = round(self.buffered, 2)
+        return {
+            "state": self.state,
+            "position": round(self.position, 2),
+            "duration": buffered if self.source and self.source.finished else None,
+            "buffered": buffered,
+            "seek_step": self.settings["seek_step"]
+        }
+
+    async def play(self, source: AudioStreamBuffer):
+        """Starts a track; returns False if it could not be loaded"""
+        await self.stop()
+        self.source = source
+        self.index = Mp3Index()
+        self.ended = asyncio.Event()
+        self.state = "loading"
+        try:
+            # The decoder reads ahead while loading, keep the loop free to feed it
+            await self.runtime.run("audio", self.load_at, 0, 0.0, False)
+        except Exception as e:
+            print(f"Audio error: {e}")
+            self.finish()
+            return False
+        if source.aborted or self.state != "loading":
+            # Stopped or cancelled while loading
+            await self.stop()
+            return False
+        self.state = "playing"
+        self.ticker = asyncio.create_task(self.tick())
+        await self.publish()
+        return True
+
+    def load_at(self, byte_offset: int, start: float, paused: bool):
+        """Audio thread: reopens the source at a frame boundary and plays from there"""
+        old_reader, self.reader = self.reader, self.source.reader(byte_offset)
+        if old_reader:
+            # A decoder waiting for more download must let go before the reload
+            old_reader.close()
+        self.music.load(self.reader)
+        self.offset = start
+        self.music.play()
+        if paused:
+            self.music.pause()
+
+    async def wait(self):
+        """Returns once the current track has ended or been stopped"""
+        if self.ended:
+            await self.ended.wait()
+
+    def finish(self):
+        if self.state == "idle":
+            return
+        self.state = "idle"
+        if self.ticker:
+            self.ticker.cancel()
+            self.ticker = None
+        if self.ended:
+            self.ended.set()
+        self.loop.create_task(self.publish())
+
+    async def tick(self):
+        last = None
+        while self.state != "idle":
+            await asyncio.sleep(self.settings["position_interval"])
+            if not self.events and self.state == "playing" and not self.music.get_busy():
+                self.finish()
+                return
+            state = self.get_state()
+            if state != last:
+                last = state
+                await self.publish(state)
+
+    async def publish(self, state=None):
+        if self.on_update:
+            await self.on_update(state or self.get_state())
+
+    async def pause(self):
+        if self.state != "playing":
+            return False
+        await self.runtime.run("audio", self.music.pause)
+        self.state = "paused"
+        await self.publish()
+        return True
+
+    async def resume(self):
+        if self.state != "paused":
+            return False
+        await self.runtime.run("audio", self.music.unpause)
+        self.state = "playing"
+        await self.publish()
+        return True
+
+    async def stop(self):
+        if not self.music:
+            return
+        reader = self.reader
+        if reader:
+            reader.close() # Unblock a read waiting on the download first
+        self.finish()
+        if reader:
+            await self.runtime.run("audio", self.music.stop)
+        self.reader = None
+        self.source = None
+
+    async def seek(self, seconds: float):
+        """Jumps to the frame playing at seconds; returns the new position"""
+        if self.state not in ("playing", "paused"):
+            return None
+        self.index.update(self.source.data)
+        if not self.source.finished:
+            # Stay a little behind the download so the decoder does not starve
+            seconds = min(seconds, self.index.duration - 1.0)
+        seconds = max(0.0, min(seconds, self.index.duration))
+        byte_offset, start = self.index.locate(seconds)
+        await self.runtime.run("audio", self.load_at, byte_offset, start, self.state == "paused")
+        await self.publish()
+        return start
+
+    async def skip(self, steps: float):
+        """Seeks by whole seek_step intervals, negative steps go back"""
+        return await self.seek(self.position + steps * self.settings["seek_step"])
+
+    def close(self):
+        self.closing.set()
+        if isinstance(self.music, PlayerProcess):
+            self.music.stop()
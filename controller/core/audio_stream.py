@@ -0,0 +1,150 @@
+import asyncio
+import os
+import threading
+
+# Length reported for a download of unknown size, so a decoder probing the
+# end of the file gets an answer right away instead of waiting for all of it
+UNKNOWN_SIZE = 2**31 - 1
+
+
+class AudioStreamBuffer:
+    """Playback buffer that is filled while audio is still downloading.
+
+    The event loop appends chunks as they arrive from the network, while the
+    mixer reads from its own thread through an AudioStreamReader. Reads past
+    the downloaded data block until more bytes arrive, the stream finishes or
+    the buffer is aborted.
+    """
+
+    def __init__(self, prebuffer_bytes: int = 32 * 1024):
+        self.prebuffer_bytes = prebuffer_bytes
+        self.expected_size = None # Content-Length, when the server sent one
+        self.data = bytearray()
+        self.finished = False
+        self.aborted = False
+        self.condition = threading.Condition()
+        # Set on the event loop once playback can start
+        self.ready = asyncio.Event()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """A complete buffer, so cached and spooled answers play like streamed ones"""
+        buffer = cls(prebuffer_bytes=0)
+        buffer.data = memoryview(data) # Nothing is appended to a complete buffer, so no copy
+        buffer.finish()
+        return buffer
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    def append(self, chunk: bytes):
+        with self.condition:
+            self.data.extend(chunk)
+            self.condition.notify_all()
+        if self.size >= self.prebuffer_bytes:
+            self.ready.set()
+
+    def finish(self):
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+        self.ready.set()
+
+    def abort(self):
+        """Unblocks every reader; subsequent reads return EOF"""
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+        self.ready.set()
+
+    def getvalue(self):
+        return bytes(self.data)
+
+    def view(self):
+        """Read-only view of a finished download, without copying it"""
+        return memoryview(self.data).toreadonly()
+
+    @property
+    def end(self):
+        """File length as the decoder sees it; never blocks"""
+        if self.finished or self.aborted:
+            return len(self.data)
+        return max(self.expected_size or UNKNOWN_SIZE, len(self.data))
+
+    def reader(self, offset: int = 0):
+        return AudioStreamReader(self, offset)
+
+class AudioStreamReader:
+    """File-like view of an AudioStreamBuffer for pygame.mixer.music.load.
+
+    Each load gets its own reader, so seeking can reopen the stream at any
+    byte offset and close the old reader without aborting the download.
+
+    SDL_mixer seeks to the end on load to size the file and look for tags.
+    While downloading, the end is the announced or a placeholder length and
+    reads past the downloaded data (anywhere but where it ends) return
+    zeros at once: no tag matches them, and playback never waits for the
+    tail. Reads at the end of the downloaded data block for more, as a
+    decoder playing through expects.
+    """
+
+    def __init__(self, buffer: AudioStreamBuffer, offset: int = 0):
+        self.buffer = buffer
+        self.start = offset # Byte offset the decoder sees as the start of the file
+        self.position = offset
+        self.closed = False
+
+    def stopped(self):
+        return self.closed or self.buffer.aborted
+
+    def read(self, size=-1):
+        buffer = self.buffer
+        with buffer.condition:
+            if size is None or size < 0:
+                while not (buffer.finished or self.stopped()):
+                    buffer.condition.wait()
+                size = len(buffer.data) - self.position
+            elif self.position > len(buffer.data) and not buffer.finished:
+                # A probe of the end of a file still downloading
+                if self.stopped():
+                    return b""
+                size = max(0, min(size, buffer.end - self.position))
+                self.position += size
+                return bytes(size)
+            else:
+                while (len(buffer.data) - self.position < size
+                       and not (buffer.finished or self.stopped())):
+                    buffer.condition.wait()
+            if self.stopped():
+                return b""
+            chunk = bytes(buffer.data[self.position:self.position + size])
+            self.position += len(chunk)
+            return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        buffer = self.buffer
+        with buffer.condition:
+            if whence == os.SEEK_END:
+                self.position = buffer.end + offset
+            elif whence == os.SEEK_CUR:
+                self.position += offset
+            else:
+                self.position = self.start + offset
+            self.position = max(self.start, self.position)
+            return self.position - self.start
+
+    def tell(self):
+        return self.position - self.start
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        """Unblocks a mixer read waiting on this reader only"""
+        with self.buffer.condition:
+            self.closed = True
+            self.buffer.condition.notify_all()
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from core.config_store import merge_settings
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class ResponseCache:
+    """On-disk LRU cache of analyze audio keyed by a perceptual frame hash and prompt.
+
+    Lookups match any entry for the same prompt whose hash is within
+    max_distance bits, so re-pressing the button on the same page hits even
+    though the frames are never byte-identical.
+
+    Hits and stores only mark the index dirty; it is written once per
+    flush_delay, atomically, one write at a time. Audio files the index does
+    not list (a store cut short by a power loss) are removed on load.
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "max_distance": 6,  # Hamming distance out of 64 bits
+        "max_mb": 50,
+        "flush_delay": 2.0,  # seconds to batch index changes before writing
+    }
+
+    def __init__(self, directory: str = "cache"):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.entries = OrderedDict() # key -> entry, least recently used first
+        self.settings = dict(self.DEFAULTS)
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.flush_handle = None
+        self.write_lock = None
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "cache")
+        self.evict()
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path, "r") as f:
+                for entry in json.load(f):
+                    if os.path.exists(self.entry_path(entry["key"])):
+                        self.entries[entry["key"]] = entry
+        except (OSError, ValueError, KeyError):
+            pass
+        self.remove_untracked()
+        print(f"Response cache loaded: {len(self.entries)} entries, {self.total_bytes() // 1024} KB")
+
+    def remove_untracked(self):
+        """Deletes audio and temp files the index does not list. Their prompt
+        is only kept in the index, so they could never be matched again."""
+        tracked = {f"{key}.mp3" for key in self.entries}
+        removed = 0
+        for name in os.listdir(self.directory):
+            if (name.endswith(".mp3") and name not in tracked) or name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            print(f"Response cache removed {removed} untracked files")
+
+    def entry_path(self, key: str):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def make_key(self, frame_hash: int, prompt: str):
+        prompt_digest = hashlib.sha1((prompt or "").encode("utf-8")).hexdigest()[:8]
+        return f"{frame_hash:016x}-{prompt_digest}"
+
+    def total_bytes(self):
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def find(self, frame_hash: int, prompt: str):
+        best_key, best_distance = None, self.settings["max_distance"] + 1
+        for key, entry in self.entries.items():
+            if entry["prompt"] != prompt:
+                continue
+            distance = hamming_distance(frame_hash, int(entry["hash"], 16))
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    async def lookup(self, frame_hash: int, prompt: str):
+        """Returns cached audio bytes for a matching frame, or None"""
+        if not self.settings["enabled"] or frame_hash is None:
+            return None
+
+        key = self.find(frame_hash, prompt)
+        if key is None:
+            self.misses += 1
+            return None
+
+        loop = asyncio.get_event_loop()
+        try:
+            audio = await loop.run_in_executor(None, self.read_file, self.entry_path(key))
+        except OSError:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.schedule_flush()
+        return audio
+
+    async def store(self, frame_hash: int, prompt: str, audio: bytes):
+        if not self.settings["enabled"] or frame_hash is None or not audio:
+            return
+
+        key = self.make_key(frame_hash, prompt)
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, self.write_file, self.entry_path(key), audio)
+        except OSError as e:
+            print(f"Response cache write failed: {e}")
+            return
+
+        self.entries.pop(key, None)
+        self.entries[key] = {
+            "key": key,
+            "hash": f"{frame_hash:016x}",
+            "prompt": prompt,
+            "size": len(audio)
+        }
+        self.evict()
+        self.schedule_flush()
+
+    def evict(self):
+        max_bytes = int(self.settings["max_mb"] * 1024 * 1024)
+        total = self.total_bytes()
+        while self.entries and total > max_bytes:
+            key, entry = self.entries.popitem(last=False)
+            total -= entry["size"]
+            try:
+                os.remove(self.entry_path(key))
+            except OSError:
+                pass
+
+    def read_file(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def write_file(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        self.write_atomic(path, lambda f: f.write(data))
+
+    def write_atomic(self, path, write):
+        """Writes through a temp file and os.replace, so a power cut leaves
+        either the old file or the new one, never half of one"""
+        fd, temp_path = tempfile.mkstemp(prefix=".cache-", suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def schedule_flush(self):
+        self.dirty = True
+        if self.flush_handle:
+            return # One index write per batch, not one per hit
+        loop = asyncio.get_running_loop()
+        self.flush_handle = loop.call_later(self.settings["flush_delay"], lambda: asyncio.create_task(self.flush()))
+
+    async def flush(self):
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.write_lock is None:
+            self.write_lock = asyncio.Lock()
+        async with self.write_lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            entries = list(self.entries.values())
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.save_index, entries)
+
+    def save_index(self, entries):
+        try:
+            data = json.dumps(entries).encode("utf-8")
+            self.write_atomic(self.index_path, lambda f: f.write(data))
+        except OSError as e:
+            print(f"Response cache index write failed: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.settings["enabled"],
+            "entries": len(self.entries),
+            "size_kb": self.total_bytes() // 1024,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100) if lookups else 0
+        }
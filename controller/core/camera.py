@@ -0,0 +1,258 @@
+import io
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from core.lazy import module_available
+
+# Raspberry Pi camera stack, only present on the device. Importing it pulls
+# in libcamera and numpy, so it waits until a camera is actually opened.
+HAS_PICAMERA = module_available("picamera2")
+
+DEMO_IMAGE_URL = 'https://cdn.dont-ping.me/api/🐭🦕🙃👻🤖.JPEG'
+
+class CameraBackend(ABC):
+    """A frame source kept open between captures. read() blocks and returns a PIL image."""
+
+    name = "base"
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def open(self):
+        pass
+
+    @abstractmethod
+    def read(self):
+        pass
+
+    def close(self):
+        pass
+
+class PicameraBackend(CameraBackend):
+    name = "picamera2"
+
+    def open(self):
+        from picamera2 import Picamera2
+        self.camera = Picamera2()
+        config = self.camera.create_still_configuration(
+            main={"size": tuple(self.settings["resolution"])},
+            buffer_count=2
+        )
+        self.camera.configure(config)
+        self.camera.start()
+
+    def read(self):
+        return self.camera.capture_image("main")
+
+    def close(self):
+        self.camera.stop()
+        self.camera.close()
+
+class FileBackend(CameraBackend):
+    """Cycles through an image file, or every image in a directory"""
+
+    name = "file"
+    EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+    def open(self):
+        path = self.settings["path"]
+        if os.path.isdir(path):
+            paths = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(self.EXTENSIONS)
+            )
+        else:
+            paths = [path]
+        if not paths:
+            raise FileNotFoundError(f"No images found in {path}")
+
+        from PIL import Image
+        # Decoded once, so reads cost no disk IO
+        self.images = []
+        for image_path in paths:
+            with Image.open(image_path) as image:
+                self.images.append(image.convert("RGB"))
+        self.index = 0
+
+    def read(self):
+        image = self.images[self.index % len(self.images)]
+        self.index += 1
+        return image
+
+class UrlBackend(CameraBackend):
+    """Downloads a still image once and serves it as every frame (demo mode)"""
+
+    name = "url"
+
+    def open(self):
+        import httpx
+        from PIL import Image
+        response = httpx.get(self.settings["url"], timeout=10, follow_redirects=True)
+        response.raise_for_status()
+        self.image = Image.open(io.BytesIO(response.content))
+        self.image.load()
+
+    def read(self):
+        return self.image
+
+class SyntheticBackend(CameraBackend):
+    """Generates a page-like test frame with a counter, no hardware or network needed"""
+
+    name = "synthetic"
+
+    def open(self):
+        self.count = 0
+
+    def read(self):
+        from PIL import Image, ImageDraw
+        width, height = self.settings["resolution"]
+        self.count += 1
+        shade = random.randint(40, 80)
+        image = Image.new("RGB", (width, height), (shade, shade, shade))
+        draw = ImageDraw.Draw(image)
+        margin_x, margin_y = width // 8, height // 10
+        draw.rectangle((margin_x, margin_y, width - margin_x, height - margin_y), fill=(235, 235, 225))
+        line_height = max(12, height // 30)
+        for line in range(margin_y + line_height, height - margin_y - line_height, line_height * 2):
+            draw.line((margin_x * 1.5, line, width - margin_x * 1.5, line), fill=(60, 60, 60), width=2)
+        draw.text((margin_x * 1.5, margin_y + 4), f"frame {self.count}", fill=(0, 0, 0))
+        return image
+
+BACKENDS = {
+    "picamera2": PicameraBackend,
+    "file": FileBackend,
+    "url": UrlBackend,
+    "synthetic": SyntheticBackend,
+}
+
+def create_backend(settings):
+    name = settings["backend"]
+    if name == "auto":
+        name = "picamera2" if HAS_PICAMERA else "url"
+    if name == "picamera2" and not HAS_PICAMERA:
+        print("picamera2 is not installed, using the synthetic camera")
+        name = "synthetic"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown camera backend: {name}")
+    return BACKENDS[name](settings)
+
+class FrameRing:
+    """Keeps the newest frames; written by the capture thread, read by the loop"""
+
+    def __init__(self, size: int):
+        self.frames = deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.seq = 0
+
+    def push(self, image):
+        with self.lock:
+            self.seq += 1
+            self.frames.append({"image": image, "time": time.monotonic(), "seq": self.seq})
+
+    def latest(self):
+        with self.lock:
+            return self.frames[-1] if self.frames else None
+
+    def recent(self, count: int, max_age: float):
+        """Up to count frames no older than max_age seconds, newest first"""
+        now = time.monotonic()
+        with self.lock:
+            frames = [frame for frame in reversed(self.frames) if now - frame["time"] <= max_age]
+        return frames[:count]
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+
+    def __len__(self):
+        return len(self.frames)
+
+class CameraStream:
+    """Keeps a backend open on its own thread and fills a FrameRing.
+
+    Opening a sensor and letting exposure settle takes seconds, reading the
+    newest frame from the ring takes microseconds, so the camera is opened
+    once and kept warm for the life of the process.
+    """
+
+    def __init__(self, backend, settings, on_frame=None):
+        self.backend = backend
+        self.settings = settings
+        self.ring = FrameRing(settings["ring_size"])
+        self.on_frame = on_frame # Called from the capture thread after each read
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.error = None
+        self.fps = 0.0
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="camera", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def open_backend(self):
+        """Opens the backend, retrying with backoff until it works or the
+        stream is stopped; returns False if stopped first. A camera that is
+        unplugged or busy at boot starts streaming once it becomes available."""
+        delay = self.settings["reopen_delay"]
+        while not self.stop_event.is_set():
+            try:
+                self.backend.open()
+                for _ in range(self.settings["warmup_frames"]):
+                    # Let auto exposure and white balance settle
+                    self.backend.read()
+                return True
+            except Exception as e:
+                self.error = f"Camera open failed: {e}"
+                print(f"{self.error}, retrying in {delay:g}s")
+                try:
+                    self.backend.close() # Release whatever the failed open grabbed
+                except Exception:
+                    pass
+            if self.on_frame:
+                self.on_frame() # Wake anyone waiting for a first frame
+            self.stop_event.wait(delay)
+            delay = min(delay * 2, self.settings["max_reopen_delay"])
+        return False
+
+    def run(self):
+        if not self.open_backend():
+            return
+
+        print(f"Camera '{self.backend.name}' streaming at {self.settings['fps']} fps")
+        interval = 1.0 / max(0.1, self.settings["fps"])
+        last = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                started = time.monotonic()
+                try:
+                    self.ring.push(self.backend.read())
+                    self.error = None
+                except Exception as e:
+                    self.error = f"Camera read failed: {e}"
+                    print(self.error)
+
+                now = time.monotonic()
+                self.fps = round(0.8 * self.fps + 0.2 / max(now - last, 1e-6), 2)
+                last = now
+                if self.on_frame:
+                    self.on_frame()
+                self.stop_event.wait(max(0.0, interval - (now - started)))
+        finally:
+            try:
+                self.backend.close()
+            except Exception as e:
+                print(f"Camera close failed: {e}")
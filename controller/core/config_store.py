@@ -0,0 +1,252 @@
+import asyncio
+import json
+import os
+import tempfile
+
+def parse_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+def coerce_setting(value, default):
+    """value converted to the type of default; raises TypeError or ValueError"""
+    if default is None:
+        return value # No type to hold it to
+    if isinstance(default, bool):
+        if isinstance(value, (dict, list)):
+            raise TypeError
+        return parse_bool(value)
+    if isinstance(default, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise TypeError
+        if isinstance(value, str):
+            value = float(value)
+        if isinstance(default, int) and float(value).is_integer():
+            return int(value)
+        return float(value) # e.g. fps 0.5 where the default is a whole number
+    if isinstance(default, str):
+        if isinstance(value, (dict, list)):
+            raise TypeError
+        return str(value)
+    if isinstance(default, (list, tuple)):
+        if not isinstance(value, (list, tuple)):
+            raise TypeError
+        return list(value)
+    if isinstance(default, dict):
+        if not isinstance(value, dict):
+            raise TypeError
+        return value
+    return value
+
+def merge_settings(defaults: dict, settings=None, section: str = "") -> dict:
+    """defaults updated with the known keys of a config section, each value
+    converted to its default's type. A value that does not convert keeps the
+    default, so {"max_mb": "50"} reads as 50 and a typo cannot stop boot."""
+    merged = dict(defaults)
+    if not isinstance(settings, dict):
+        return merged
+    for key, value in settings.items():
+        if key not in defaults:
+            continue
+        try:
+            merged[key] = coerce_setting(value, defaults[key])
+        except (TypeError, ValueError):
+            name = f"{section}.{key}" if section else key
+            print(f"Config {name}={value!r} is not a valid {type(defaults[key]).__name__}, using {defaults[key]!r}")
+    return merged
+
+class ConfigReader:
+    """Typed reads of a config dict; bad values fall back to the default"""
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+    def get_str(self, key: str, default: str = "") -> str:
+        value = self.data.get(key)
+        return default if value is None else str(value)
+
+    def get_int(self, key: str, default: int = 0) -> int:
+        return self.coerce(key, int, default)
+
+    def get_float(self, key: str, default: float = 0.0) -> float:
+        return self.coerce(key, float, default)
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self.data.get(key)
+        if value is None:
+            return default
+        return parse_bool(value)
+
+    def get_dict(self, key: str) -> dict:
+        value = self.data.get(key)
+        return value if isinstance(value, dict) else None
+
+    def get_list(self, key: str) -> list:
+        value = self.data.get(key)
+        return value if isinstance(value, list) else None
+
+    def coerce(self, key, kind, default):
+        value = self.data.get(key)
+        if value is None:
+            return default
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            print(f"Config {key}={value!r} is not a valid {kind.__name__}, using {default}")
+            return default
+
+    def overlay(self, overrides: dict):
+        """A reader of this config with some keys replaced, e.g. by a station's
+        own settings. Dict values merge over the current one instead of
+        replacing it, so a station's audio sink keeps the governor's audio overrides."""
+        data = dict(self.data)
+        for key, value in overrides.items():
+            current = data.get(key)
+            data[key] = {**current, **value} if isinstance(value, dict) and isinstance(current, dict) else value
+        return ConfigReader(data)
+
+class ConfigStore(ConfigReader):
+    """In-memory configuration with a version counter.
+
+    Every update swaps in a new dict, so a snapshot taken from `data` never
+    changes underneath its reader. Writes to disk are debounced and done off
+    the loop as temp file + fsync + rename, so a crash mid-write leaves the
+    previous config.json intact. Modules subscribe to the keys they depend on
+    instead of reading the dict on every request.
+
+    `base` is what the user saved; `data` is base with the runtime overrides
+    (the power governor's profile) merged over it. Overrides are never
+    written to disk or shown in the settings form.
+    """
+
+    DEFAULTS = {
+        "api_key": "",
+        "base_url": "",
+        "active_prompt": "index"
+    }
+
+    def __init__(self, path: str = "config.json", save_delay: float = 0.5):
+        super().__init__(dict(self.DEFAULTS))
+        self.base = self.data
+        self.overrides = {} # key -> value, dicts merge one level into the base value
+        self.path = path
+        self.save_delay = save_delay # seconds of quiet before writing
+        self.version = 0
+        self.saved_version = 0
+        self.subscribers = [] # (keys, callback)
+        self.save_handle = None
+        self.write_lock = None
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self.base = data
+                else:
+                    print(f"Config {self.path} holds a {type(data).__name__}, not an object; using defaults")
+            except (OSError, ValueError) as e:
+                print(f"Config load failed, using defaults: {e}")
+        self.data = self.merged()
+        return self.base
+
+    def subscribe(self, keys, callback, immediate: bool = True):
+        """Calls callback(store) whenever one of keys changes, and once now
+        unless immediate is False. Callbacks run on the loop and must not block."""
+        self.subscribers.append((frozenset(keys), callback))
+        if immediate:
+            callback(self)
+        return callback
+
+    def unsubscribe(self, callback):
+        # ==, not is: each access to a bound method creates a new object
+        self.subscribers = [entry for entry in self.subscribers if entry[1] != callback]
+
+    def update(self, changes: dict):
+        """Applies changes atomically and returns the keys whose value changed"""
+        changed = {key for key, value in changes.items() if self.base.get(key) != value}
+        if not changed:
+            return changed
+        self.base = {**self.base, **changes}
+        self.version += 1
+        self.schedule_save()
+        self.refresh()
+        return changed
+
+    def set_overrides(self, overrides: dict):
+        """Replaces the runtime overrides; returns the keys whose effective value changed"""
+        self.overrides = dict(overrides)
+        return self.refresh()
+
+    def merged(self):
+        data = dict(self.base)
+        for key, value in self.overrides.items():
+            if isinstance(value, dict) and isinstance(data.get(key), dict):
+                data[key] = {**data[key], **value}
+            else:
+                data[key] = value
+        return data
+
+    def refresh(self):
+        """Recomputes data and tells the subscribers of every key that changed"""
+        previous, self.data = self.data, self.merged()
+        changed = {key for key in previous.keys() | self.data.keys() if previous.get(key) != self.data.get(key)}
+        for keys, callback in list(self.subscribers):
+            if keys & changed:
+                try:
+                    callback(self)
+                except Exception as e:
+                    print(f"Config subscriber {getattr(callback, '__qualname__', callback)} failed: {e}")
+        return changed
+
+    def schedule_save(self):
+        if not self.path:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop yet (startup scripts): write straight away
+            self.write(self.path, self.base)
+            self.saved_version = self.version
+            return
+        if self.save_handle:
+            self.save_handle.cancel()
+        self.save_handle = loop.call_later(self.save_delay, lambda: asyncio.create_task(self.flush()))
+
+    async def flush(self):
+        """Writes the current version if it has not been saved yet"""
+        if self.save_handle:
+            self.save_handle.cancel()
+            self.save_handle = None
+        if self.write_lock is None:
+            self.write_lock = asyncio.Lock()
+        async with self.write_lock:
+            version, data = self.version, self.base
+            if version == self.saved_version or not self.path:
+                return
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(None, self.write, self.path, data)
+                self.saved_version = version
+            except OSError as e:
+                print(f"Config write failed: {e}")
+
+    def write(self, path, data):
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
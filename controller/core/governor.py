@@ -0,0 +1,180 @@
+import time
+from collections import deque
+from core.config_store import merge_settings
+
+# Config overrides each profile lays over the saved settings. They use the
+# keys the modules already subscribe to, so a profile change reaches them
+# like a settings change would; "performance" runs the config as saved.
+PROFILES = {
+    "performance": {},
+    "balanced": {
+        "telemetry": {"interval": 10},
+        "loop_monitor": {"interval": 1.0},
+        "audio": {"position_interval": 1.0},
+        "camera": {"fps": 1},
+        "quality": {"burst_size": 2},
+        "preprocess": {"max_edge": 1400, "jpeg_quality": 80},
+        "cache": {"max_distance": 8},
+        "runtime": {"image_workers": 1},
+    },
+    "cool": {
+        "telemetry": {"interval": 10},
+        "loop_monitor": {"interval": 1.0},
+        "audio": {"position_interval": 1.0},
+        "camera": {"fps": 1, "resolution": [1332, 990]},
+        "quality": {"burst_size": 1},
+        "preprocess": {"max_edge": 1280, "jpeg_quality": 75},
+        "cache": {"max_distance": 10},
+        "runtime": {"image_workers": 1, "io_workers": 2},
+    },
+    "powersave": {
+        "telemetry": {"interval": 30},
+        "loop_monitor": {"interval": 2.0},
+        "audio": {"position_interval": 2.0},
+        # One frame every two seconds is older than the default stall limit
+        "camera": {"fps": 0.5, "resolution": [1332, 990], "max_frame_age_ms": 3000},
+        "quality": {"burst_size": 1},
+        "preprocess": {"max_edge": 1024, "jpeg_quality": 70, "max_bytes": 200 * 1024},
+        "cache": {"max_distance": 12},
+        "runtime": {"image_workers": 1, "io_workers": 2},
+    },
+}
+
+# Least to most restrictive; when several rules match the last one wins
+PROFILE_ORDER = ("performance", "balanced", "cool", "powersave")
+
+class PowerGovernor:
+    """Picks a performance profile from battery and CPU temperature readings
+    and applies it as runtime overrides on the ConfigStore.
+
+    Moving to a more restrictive profile happens on the first reading that
+    asks for it. Moving back needs the reading to clear the threshold by the
+    hysteresis margin and the current profile to have held for min_dwell
+    seconds, so a reading hovering at a threshold does not flap the camera
+    and worker pools. mode pins a profile instead of choosing one.
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "mode": "auto",             # auto or a profile name
+        "battery_percent": 50,      # on battery at or below: balanced
+        "critical_percent": 20,     # on battery at or below: powersave
+        "warm_temp": 68,            # deg C at or above: balanced
+        "hot_temp": 75,             # deg C at or above: cool
+        "hysteresis_percent": 5,
+        "hysteresis_temp": 4,
+        "min_dwell": 60,            # seconds before relaxing to a lighter profile
+        "profiles": {},             # name -> overrides merged over the built-in ones
+    }
+
+    def __init__(self, config, history_size: int = 20):
+        self.config = config
+        self.settings = dict(self.DEFAULTS)
+        self.profile = "performance"
+        self.reason = "startup"
+        self.since = time.time()
+        self.changed_at = time.monotonic()
+        self.pinned = False
+        self.inputs = None # last reading
+        self.history = deque(maxlen=history_size)
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "governor")
+
+    def profiles(self):
+        profiles = {name: dict(overrides) for name, overrides in PROFILES.items()}
+        custom = self.settings["profiles"] if isinstance(self.settings["profiles"], dict) else {}
+        for name, overrides in custom.items():
+            if name not in profiles or not isinstance(overrides, dict):
+                continue
+            for key, value in overrides.items():
+                base = profiles[name].get(key)
+                profiles[name][key] = {**base, **value} if isinstance(base, dict) and isinstance(value, dict) else value
+        return profiles
+
+    def choose(self, inputs, relax: bool):
+        """(profile, reason) the reading asks for; relax widens every
+        threshold by its hysteresis margin in favour of the current profile"""
+        settings = self.settings
+        percent = inputs.get("battery_percent")
+        on_battery = percent is not None and not inputs.get("charging", True)
+        temp = inputs.get("cpu_temp")
+        margin_percent = settings["hysteresis_percent"] if relax else 0
+        margin_temp = settings["hysteresis_temp"] if relax else 0
+
+        wanted = []
+        if on_battery and percent <= settings["critical_percent"] + margin_percent:
+            wanted.append(("powersave", f"battery at {percent}%"))
+        if temp is not None and temp >= settings["hot_temp"] - margin_temp:
+            wanted.append(("cool", f"CPU at {temp} °C"))
+        if on_battery and percent <= settings["battery_percent"] + margin_percent:
+            wanted.append(("balanced", f"on battery at {percent}%"))
+        if temp is not None and temp >= settings["warm_temp"] - margin_temp:
+            wanted.append(("balanced", f"CPU at {temp} °C"))
+        if not wanted:
+            return "performance", "on mains power" if not on_battery else f"battery at {percent}%"
+        return max(wanted, key=lambda entry: PROFILE_ORDER.index(entry[0]))
+
+    def update(self, inputs=None):
+        """Re-evaluates with a new reading (or the last one); returns the
+        history entry if the profile changed, otherwise None"""
+        if inputs is not None:
+            self.inputs = inputs
+        settings = self.settings
+        mode = settings["mode"]
+        if not settings["enabled"]:
+            return self.apply("performance", "governor disabled", pinned=True)
+        if mode != "auto":
+            if mode in PROFILES:
+                return self.apply(mode, "pinned from the dashboard", pinned=True)
+            print(f"Unknown governor mode {mode!r}, choosing automatically")
+        if self.inputs is None:
+            return None
+
+        profile, reason = self.choose(self.inputs, relax=False)
+        if PROFILE_ORDER.index(profile) < PROFILE_ORDER.index(self.profile) and not self.pinned:
+            # Relaxing: the reading must clear the thresholds by the margin, after the dwell time
+            if time.monotonic() - self.changed_at < settings["min_dwell"]:
+                return None
+            relaxed = self.choose(self.inputs, relax=True)
+            if PROFILE_ORDER.index(relaxed[0]) > PROFILE_ORDER.index(self.profile):
+                return None # Only wider thresholds ask for more; stay put
+            profile, reason = relaxed
+        return self.apply(profile, reason)
+
+    def apply(self, profile: str, reason: str, pinned: bool = False):
+        self.pinned = pinned
+        overrides = self.profiles()[profile]
+        # Also reapplied when the profile stays but its overrides were edited
+        changed = self.config.set_overrides(overrides) if overrides != self.config.overrides else set()
+        if profile == self.profile:
+            self.reason = reason
+            return None
+        entry = {
+            "time": time.strftime("%H:%M:%S"),
+            "ts": round(time.time(), 3),
+            "from": self.profile,
+            "to": profile,
+            "reason": reason,
+            "changed": sorted(changed)
+        }
+        self.profile = profile
+        self.reason = reason
+        self.since = entry["ts"]
+        self.changed_at = time.monotonic()
+        self.history.appendleft(entry)
+        print(f"Governor: {entry['from']} -> {profile} ({reason}), changed {', '.join(entry['changed']) or 'nothing'}")
+        return entry
+
+    def get_state(self):
+        return {
+            "enabled": self.settings["enabled"],
+            "mode": self.settings["mode"],
+            "profile": self.profile,
+            "reason": self.reason,
+            "since": self.since,
+            "inputs": self.inputs,
+            "profiles": list(PROFILE_ORDER),
+            "overrides": self.config.overrides,
+            "history": list(self.history)
+        }
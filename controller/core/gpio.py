@@ -0,0 +1,167 @@
+import asyncio
+import time
+from core.config_store import merge_settings
+
+# Mock GPIO for non-Pi environments
+try:
+    import RPi.GPIO as GPIO
+    IS_PI = True
+except (ImportError, RuntimeError):
+    class MockGPIO:
+        BCM = 'BCM'
+        IN = 'IN'
+        PUD_UP = 'PUD_UP'
+        LOW = 0
+        HIGH = 1
+        FALLING = 'FALLING'
+        RISING = 'RISING'
+        BOTH = 'BOTH'
+
+        def __init__(self):
+            self.levels = {}
+            self.callbacks = {}
+
+        def setmode(self, mode): pass
+        def setup(self, pin, mode, pull_up_down=None):
+            self.levels.setdefault(pin, self.HIGH) # Pulled up, not pressed
+        def input(self, pin): return self.levels.get(pin, self.HIGH)
+        def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+            self.callbacks[pin] = callback
+        def remove_event_detect(self, pin):
+            self.callbacks.pop(pin, None)
+        def cleanup(self):
+            self.callbacks.clear()
+
+        def inject_edge(self, pin, level):
+            """Simulates the pin changing level, firing the edge callback like RPi.GPIO would"""
+            if self.levels.get(pin, self.HIGH) == level:
+                return
+            self.levels[pin] = level
+            callback = self.callbacks.get(pin)
+            if callback:
+                callback(pin)
+
+        def press(self, pin, duration=0.05):
+            """Blocking helper for tests: press and release a button"""
+            self.inject_edge(pin, self.LOW)
+            time.sleep(duration)
+            self.inject_edge(pin, self.HIGH)
+
+    GPIO = MockGPIO()
+    IS_PI = False
+
+class ButtonInput:
+    """Interrupt-driven push buttons with software debounce and gestures.
+
+    RPi.GPIO calls on_edge from its own thread; edges are timestamped there
+    and handed to the event loop with call_soon_threadsafe. Each button maps
+    the gestures press, long_press and double_press to a command name.
+    """
+
+    DEFAULTS = {
+        "debounce_ms": 30,
+        "long_press_ms": 800,
+        "double_press_ms": 300,
+    }
+
+    def __init__(self, buttons, on_gesture, settings=None):
+        self.buttons = {button["pin"]: button for button in buttons}
+        self.on_gesture = on_gesture # async (command, pin, gesture)
+        self.settings = merge_settings(self.DEFAULTS, settings, "button_timing")
+        self.loop = None
+        self.states = {}
+
+    def start(self, loop):
+        self.loop = loop
+        GPIO.setmode(GPIO.BCM)
+        for pin in self.buttons:
+            GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            self.states[pin] = {
+                "level": GPIO.input(pin),
+                "last_edge": 0.0,
+                "long_timer": None,
+                "long_fired": False,
+                "single_timer": None,
+                "swallow_release": False
+            }
+            GPIO.add_event_detect(pin, GPIO.BOTH, callback=self.on_edge)
+        print(f"Buttons armed on pins {sorted(self.buttons)}")
+
+    def stop(self):
+        for pin, state in self.states.items():
+            GPIO.remove_event_detect(pin)
+            for timer in (state["long_timer"], state["single_timer"]):
+                if timer:
+                    timer.cancel()
+        self.states.clear()
+
+    def on_edge(self, pin):
+        # GPIO thread: never touch loop state here
+        level = GPIO.input(pin)
+        timestamp = time.monotonic()
+        self.loop.call_soon_threadsafe(self.handle_edge, pin, level, timestamp)
+
+    def handle_edge(self, pin, level, timestamp):
+        state = self.states.get(pin)
+        if state is None or level == state["level"]:
+            return
+        if (timestamp - state["last_edge"]) * 1000 < self.settings["debounce_ms"]:
+            # Contact bounce; re-read once it has settled so a real edge isn't lost
+            self.loop.call_later(self.settings["debounce_ms"] / 1000, self.resample, pin)
+            return
+        state["level"] = level
+        state["last_edge"] = timestamp
+        button = self.buttons[pin]
+
+        if level == GPIO.LOW:
+            if state["single_timer"]:
+                # Second press inside the window
+                state["single_timer"].cancel()
+                state["single_timer"] = None
+                state["swallow_release"] = True
+                self.fire(pin, "double_press")
+                return
+            if not button.get("long_press") and not button.get("double_press"):
+                # Nothing to disambiguate, act on the press edge itself
+                state["swallow_release"] = True
+                self.fire(pin, "press")
+                return
+            if button.get("long_press"):
+                state["long_timer"] = self.loop.call_later(
+                    self.settings["long_press_ms"] / 1000, self.fire_long_press, pin
+                )
+            return
+
+        # Released
+        if state["long_timer"]:
+            state["long_timer"].cancel()
+            state["long_timer"] = None
+        if state["long_fired"] or state["swallow_release"]:
+            state["long_fired"] = False
+            state["swallow_release"] = False
+            return
+        if button.get("double_press"):
+            state["single_timer"] = self.loop.call_later(
+                self.settings["double_press_ms"] / 1000, self.fire_single_press, pin
+            )
+        else:
+            self.fire(pin, "press")
+
+    def resample(self, pin):
+        if pin in self.states:
+            self.handle_edge(pin, GPIO.input(pin), time.monotonic())
+
+    def fire_long_press(self, pin):
+        state = self.states[pin]
+        state["long_timer"] = None
+        state["long_fired"] = True
+        self.fire(pin, "long_press")
+
+    def fire_single_press(self, pin):
+        self.states[pin]["single_timer"] = None
+        self.fire(pin, "press")
+
+    def fire(self, pin, gesture):
+        command = self.buttons[pin].get(gesture)
+        if command:
+            asyncio.ensure_future(self.on_gesture(command, pin, gesture))
@@ -0,0 +1,101 @@
+import asyncio
+from core.lazy import module_available, preload
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HAS_HTTP2 = module_available("h2")
+
+def is_transient_error(error):
+    """Connection failures and timeouts are worth retrying later, bad requests are not"""
+    import httpx
+    return isinstance(error, httpx.TransportError)
+
+class HttpService:
+    """Long-lived, pooled HTTP client to the web API shared by all modules"""
+
+    DEFAULT_TIMEOUT = 10.0
+    CONNECT_TIMEOUT = 5.0
+    ROUTE_TIMEOUTS = {
+        "/api/analyze": 120.0,
+        "/api/analyze/cancel": 5.0,
+        "/api/version": 10.0,
+    }
+
+    def __init__(self):
+        self.base_url = ""
+        self.http2 = False
+        self.client = None
+
+    def build_client(self):
+        import httpx
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=10,
+                max_keepalive_connections=5,
+                keepalive_expiry=60.0
+            ),
+            timeout=httpx.Timeout(self.DEFAULT_TIMEOUT, connect=self.CONNECT_TIMEOUT)
+        )
+
+    def configure(self, base_url: str, http2: bool = False):
+        """(Re)builds the client when the base URL or protocol changes"""
+        base_url = (base_url or "").rstrip("/")
+        if http2 and not HAS_HTTP2:
+            print("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+
+        if self.client and base_url == self.base_url and http2 == self.http2:
+            return False
+
+        old_client = self.client
+        self.base_url = base_url
+        self.http2 = http2
+        self.client = self.build_client()
+        print(f"HTTP client ready for {self.base_url or '<unset>'} (http2={self.http2})")
+
+        if old_client:
+            asyncio.create_task(self.retire_client(old_client))
+        return True
+
+    async def retire_client(self, client):
+        # Let requests already in flight on the old pool finish first
+        await asyncio.sleep(max(self.ROUTE_TIMEOUTS.values()))
+        await client.aclose()
+
+    async def start(self, base_url: str, http2: bool = False, warmup: bool = True):
+        # httpx takes a noticeable while to import on a Pi; do it off the loop
+        await asyncio.get_running_loop().run_in_executor(None, preload, ("httpx",))
+        self.configure(base_url, http2)
+        if warmup:
+            asyncio.create_task(self.warmup())
+
+    async def warmup(self):
+        """Opens a pooled connection ahead of the first real request"""
+        if not self.base_url:
+            return
+        try:
+            await self.request("GET", "/api/version")
+            print(f"HTTP connection to {self.base_url} warmed up")
+        except Exception as e:
+            print(f"HTTP warmup failed: {e}")
+
+    def timeout_for(self, path: str):
+        import httpx
+        return httpx.Timeout(
+            self.ROUTE_TIMEOUTS.get(path, self.DEFAULT_TIMEOUT),
+            connect=self.CONNECT_TIMEOUT
+        )
+
+    async def request(self, method: str, path: str, **kwargs):
+        kwargs.setdefault("timeout", self.timeout_for(path))
+        return await self.client.request(method, path, **kwargs)
+
+    def stream(self, method: str, path: str, **kwargs):
+        kwargs.setdefault("timeout", self.timeout_for(path))
+        return self.client.stream(method, path, **kwargs)
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
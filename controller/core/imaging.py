@@ -0,0 +1,185 @@
+import io
+from multiprocessing.shared_memory import SharedMemory
+from core.config_store import merge_settings
+
+DEFAULT_PREPROCESS = {
+    "exif_orientation": True,
+    "crop_page": False,
+    "page_threshold": 150,     # 0-255, pixels brighter than this count as paper
+    "max_edge": 1600,          # px, 0 disables downscaling
+    "grayscale": False,
+    "jpeg_quality": 85,
+    "min_jpeg_quality": 45,
+    "max_bytes": 350 * 1024,   # byte budget for the encoded upload, 0 disables
+}
+
+EXIF_ORIENTATION = 0x0112
+
+def preprocess_options(overrides=None):
+    return merge_settings(DEFAULT_PREPROCESS, overrides, "preprocess")
+
+def crop_to_page(image, threshold):
+    """Crops to the bounding box of the bright paper region, if one stands out"""
+    from PIL import ImageOps
+    probe = image.convert("L")
+    probe.thumbnail((256, 256))
+    mask = ImageOps.autocontrast(probe).point(lambda p: 255 if p > threshold else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return image
+
+    left, top, right, bottom = bbox
+    # Ignore detections that are too small to be a page
+    if (right - left) * (bottom - top) < 0.2 * probe.width * probe.height:
+        return image
+
+    scale_x = image.width / probe.width
+    scale_y = image.height / probe.height
+    margin = 2
+    return image.crop((
+        max(0, int((left - margin) * scale_x)),
+        max(0, int((top - margin) * scale_y)),
+        min(image.width, int((right + margin) * scale_x)),
+        min(image.height, int((bottom + margin) * scale_y)),
+    ))
+
+def encode_jpeg(image, quality):
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=quality, optimize=True)
+    return buffered.getvalue()
+
+def encode_within_budget(image, max_quality, min_quality, max_bytes):
+    """Encodes at the highest quality that fits the byte budget (binary search)"""
+    data = encode_jpeg(image, max_quality)
+    if not max_bytes or len(data) <= max_bytes:
+        return data, max_quality
+
+    best, best_quality = None, min_quality
+    low, high = min_quality, max_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = encode_jpeg(image, quality)
+        if len(candidate) <= max_bytes:
+            best, best_quality = candidate, quality
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        # Nothing fits, ship the smallest we are allowed to produce
+        best = encode_jpeg(image, min_quality)
+    return best, best_quality
+
+def dhash(image, hash_size=8):
+    """64-bit difference hash; near-identical pages differ by a few bits"""
+    from PIL import Image
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def preprocess_image(image, options=None):
+    """Runs the configured steps and encodes the frame exactly once.
+
+    Blocking; run it on the runtime's "image" executor. Returns a dict with the JPEG
+    bytes shared by the upload and the dashboard preview, plus a perceptual
+    hash of the processed frame.
+    """
+    from PIL import Image, ImageOps
+    options = options or DEFAULT_PREPROCESS
+
+    if options["exif_orientation"]:
+        image = ImageOps.exif_transpose(image)
+    if options["crop_page"]:
+        image = crop_to_page(image, options["page_threshold"])
+    if options["max_edge"]:
+        # thumbnail() only ever shrinks and keeps the aspect ratio
+        image = image.copy()
+        image.thumbnail((options["max_edge"], options["max_edge"]), Image.LANCZOS)
+    image = image.convert("L" if options["grayscale"] else "RGB")
+
+    data, quality = encode_within_budget(
+        image,
+        options["jpeg_quality"],
+        options["min_jpeg_quality"],
+        options["max_bytes"]
+    )
+    return {
+        "data": data,
+        "hash": dhash(image),
+        "width": image.width,
+        "height": image.height,
+        "quality": quality,
+        "size": len(data)
+    }
+
+class SharedFrames:
+    """A burst copied once into shared memory for the image process pool.
+
+    Pickling full-resolution frames for every call would copy them through a
+    pipe; workers get only the block name and attach to it. The module that
+    created the block releases it once the workers are done. Raw pixels do
+    not carry EXIF, so each frame's orientation tag travels in its spec and
+    is put back on load for exif_transpose.
+    """
+
+    def __init__(self, images):
+        # Blocking; run it on an executor
+        raw = [image.tobytes() for image in images]
+        self.block = SharedMemory(create=True, size=max(1, sum(len(data) for data in raw)))
+        self.name = self.block.name
+        self.specs = []
+        offset = 0
+        for image, data in zip(images, raw):
+            self.block.buf[offset:offset + len(data)] = data
+            orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+            self.specs.append((image.mode, image.size, offset, len(data), orientation))
+            offset += len(data)
+
+    def __getstate__(self):
+        return {"name": self.name, "specs": self.specs, "block": None}
+
+    def __len__(self):
+        return len(self.specs)
+
+    def load(self, indexes=None):
+        """Copies frames back out into PIL images (in the worker)"""
+        from PIL import Image
+        block = self.block or SharedMemory(self.name)
+        try:
+            images = []
+            for index in (range(len(self.specs)) if indexes is None else indexes):
+                mode, size, offset, length, orientation = self.specs[index]
+                with block.buf[offset:offset + length] as view:
+                    image = Image.frombytes(mode, size, view)
+                if orientation != 1:
+                    exif = Image.Exif()
+                    exif[EXIF_ORIENTATION] = orientation
+                    image.info["exif"] = exif.tobytes()
+                images.append(image)
+            return images
+        finally:
+            if block is not self.block:
+                block.close()
+
+    def release(self):
+        self.block.close()
+        self.block.unlink()
+
+def load_frames(frames, indexes=None):
+    if isinstance(frames, SharedFrames):
+        return frames.load(indexes)
+    return list(frames) if indexes is None else [frames[index] for index in indexes]
+
+def score_frames(frames, options):
+    """pick_best_frame for a list of images or SharedFrames"""
+    from core.quality import pick_best_frame
+    return pick_best_frame(load_frames(frames), options)
+
+def prepare_frame(frames, index, options):
+    """preprocess_image for one frame of a list of images or SharedFrames"""
+    return preprocess_image(load_frames(frames, [index])[0], options)
@@ -0,0 +1,35 @@
+import importlib
+import importlib.util
+import sys
+import time
+
+# Imported on first use rather than at boot; together they cost seconds on a Pi
+HEAVY_MODULES = ("httpx", "PIL.Image", "numpy", "pygame")
+
+def module_available(name: str) -> bool:
+    """Whether name can be imported, without importing it"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def preload(names=HEAVY_MODULES):
+    """Imports modules ahead of their first use and returns {name: ms}.
+
+    Blocking; run it in an executor after startup so the first button press
+    does not pay for the imports. Missing optional modules are skipped.
+    """
+    timings = {}
+    for name in names:
+        if name in sys.modules or not module_available(name):
+            continue
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Preloading {name} failed: {e}")
+            continue
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
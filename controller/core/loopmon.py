@@ -0,0 +1,238 @@
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from core.metrics import Histogram
+from core.config_store import merge_settings
+
+# Who the running code belongs to, e.g. "vision" or "vision.trigger_vision".
+# Tasks copy the context they were created in, so work spawned by a command
+# stays attributed to it.
+current_owner = contextvars.ContextVar("current_owner", default=None)
+
+@contextmanager
+def owned(owner: str):
+    token = current_owner.set(owner)
+    try:
+        yield
+    finally:
+        current_owner.reset(token)
+
+async def attributed(owner: str, coro):
+    # Runs inside the new task's own context copy
+    current_owner.set(owner)
+    return await coro
+
+def describe_callback(handle):
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if isinstance(task, asyncio.Task):
+        coro = task.get_coro()
+        if getattr(coro, "__qualname__", None) == "attributed":
+            # BaseModule.create_task names the task after the wrapped coroutine
+            return task.get_name()
+        return getattr(coro, "__qualname__", repr(coro))
+    return getattr(callback, "__qualname__", repr(callback))
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a side thread.
+
+    Samples taken while the loop waits in select() count as idle, so the hot
+    stacks show only where the loop was actually busy.
+    """
+
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle = 0
+        self.started = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval: float = 0.005, duration: float = 30.0):
+        self.stacks.clear()
+        self.samples = 0
+        self.idle = 0
+        self.started = time.monotonic()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, args=(interval, duration), name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self, interval, duration):
+        deadline = time.monotonic() + duration
+        while not self.stop_event.wait(interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < 40:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples += 1
+            if stack[0].startswith("select (selectors.py") or stack[0].startswith("poll (selectors.py"):
+                self.idle += 1
+                continue
+            # Innermost 12 frames, outermost first, are enough to tell call sites apart
+            self.stacks[tuple(reversed(stack[:12]))] += 1
+
+    def report(self, top: int = 10):
+        busy = self.samples - self.idle
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "busy_percent": round(busy / self.samples * 100, 1) if self.samples else 0,
+            "hot": [
+                {
+                    "stack": list(stack),
+                    "samples": count,
+                    "percent": round(count / busy * 100, 1)
+                }
+                for stack, count in self.stacks.most_common(top)
+            ]
+        }
+
+class LoopMonitor:
+    """Measures event loop lag and catches callbacks that block it.
+
+    Every callback the loop runs is timed by wrapping Handle._run; anything
+    over the threshold is charged to the owner found in the callback's
+    context, so a freeze can be traced back to a module or command.
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "interval": 0.5,          # seconds between lag probes
+        "slow_callback_ms": 50,
+    }
+
+    def __init__(self):
+        self.settings = dict(self.DEFAULTS)
+        self.lag = Histogram()
+        self.last_lag_ms = 0.0
+        self.slow_callbacks = deque(maxlen=50)
+        self.owners = {} # owner -> {"count", "blocked_ms"}
+        self.original_run = None
+        self.profiler = None
+        self.probe_task = None
+        self.on_update = None # async (state), called after each probe round
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "loop_monitor")
+
+    def start(self, on_update=None):
+        self.on_update = on_update
+        if not self.settings["enabled"]:
+            return
+        self.install()
+        self.profiler = SamplingProfiler(threading.get_ident())
+        if self.probe_task is None or self.probe_task.done():
+            self.probe_task = asyncio.create_task(self.probe())
+
+    def install(self):
+        if self.original_run:
+            return
+        monitor = self
+        original = self.original_run = asyncio.events.Handle._run
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            original(handle)
+            elapsed = time.perf_counter() - started
+            if elapsed * 1000 >= monitor.settings["slow_callback_ms"]:
+                monitor.record_slow(handle, elapsed)
+
+        asyncio.events.Handle._run = timed_run
+
+    def uninstall(self):
+        if self.original_run:
+            asyncio.events.Handle._run = self.original_run
+            self.original_run = None
+
+    def record_slow(self, handle, elapsed: float):
+        context = getattr(handle, "_context", None)
+        owner = (context.get(current_owner) if context else None) or "unattributed"
+        blocked_ms = round(elapsed * 1000, 1)
+        stats = self.owners.setdefault(owner, {"count": 0, "blocked_ms": 0.0})
+        stats["count"] += 1
+        stats["blocked_ms"] = round(stats["blocked_ms"] + blocked_ms, 1)
+        self.slow_callbacks.appendleft({
+            "owner": owner,
+            "callback": describe_callback(handle),
+            "blocked_ms": blocked_ms,
+            "time": time.strftime("%H:%M:%S")
+        })
+        print(f"Event loop blocked for {blocked_ms} ms by {owner} ({self.slow_callbacks[0]['callback']})")
+
+    async def probe(self):
+        loop = asyncio.get_running_loop()
+        rounds = 0
+        while True:
+            interval = self.settings["interval"]
+            started = loop.time()
+            await asyncio.sleep(interval)
+            # Anything past the requested sleep is time the loop could not run us
+            lag = max(0.0, loop.time() - started - interval)
+            self.lag.observe(lag)
+            self.last_lag_ms = round(lag * 1000, 1)
+            rounds += 1
+            if self.on_update and rounds % max(1, int(5 / interval)) == 0:
+                await self.on_update(self.get_state())
+
+    def start_profiler(self, interval_ms: float = 5, duration: float = 30):
+        if not self.profiler:
+            return False
+        self.profiler.start(interval_ms / 1000, duration)
+        return True
+
+    def stop_profiler(self):
+        if self.profiler:
+            self.profiler.stop()
+
+    def get_state(self):
+        quantile = lambda q: round(self.lag.quantile(q) * 1000, 1) if self.lag.recent else None
+        return {
+            "lag": {
+                "last_ms": self.last_lag_ms,
+                "p50_ms": quantile(0.5),
+                "p99_ms": quantile(0.99),
+                "max_ms": round(max(self.lag.recent) * 1000, 1) if self.lag.recent else None
+            },
+            "owners": self.owners,
+            "slow_callbacks": list(self.slow_callbacks)[:10],
+            "profiler": self.profiler.report() if self.profiler else None
+        }
+
+    def render_metrics(self):
+        """Prometheus lines appended to /metrics"""
+        lines = [
+            "# HELP vgas_event_loop_lag_seconds Delay of the loop lag probe over its sleep",
+            "# TYPE vgas_event_loop_lag_seconds summary",
+        ]
+        for q in (0.5, 0.99):
+            value = self.lag.quantile(q)
+            if value is not None:
+                lines.append(f'vgas_event_loop_lag_seconds{{quantile="{q}"}} {value:.6f}')
+        lines.append(f"vgas_event_loop_lag_seconds_sum {self.lag.sum:.6f}")
+        lines.append(f"vgas_event_loop_lag_seconds_count {self.lag.count}")
+        lines.append("# HELP vgas_event_loop_blocked_seconds_total Time spent in slow callbacks by owner")
+        lines.append("# TYPE vgas_event_loop_blocked_seconds_total counter")
+        for owner, stats in sorted(self.owners.items()):
+            lines.append(f'vgas_event_loop_blocked_seconds_total{{owner="{owner}"}} {stats["blocked_ms"] / 1000:.3f}')
+        lines.append("# HELP vgas_slow_callbacks_total Callbacks over the slow threshold by owner")
+        lines.append("# TYPE vgas_slow_callbacks_total counter")
+        for owner, stats in sorted(self.owners.items()):
+            lines.append(f'vgas_slow_callbacks_total{{owner="{owner}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
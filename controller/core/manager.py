@@ -1,67 +1,265 @@
+import ast
 import asyncio
 import importlib
+import os
 import pkgutil
+import time
 from typing import Dict
 from core.socket import socket_manager
 from core.module import BaseModule
+from core.http import HttpService
+from core.cache import ResponseCache
+from core.assets import AssetStore
+from core.state import StateSync
+from core.spool import UploadSpool
+from core.metrics import MetricsRegistry
+from core.loopmon import LoopMonitor, attributed, owned
+from core.config_store import ConfigStore
+from core.lazy import preload
+from core.runtime import ModuleRuntime
+from core.notifications import NotificationLog
+
+def read_manifest(path: str):
+    """The module file's MANIFEST literal, found by parsing rather than importing it"""
+    try:
+        with open(path, "r") as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError):
+        return None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "MANIFEST" for target in node.targets):
+            try:
+                manifest = ast.literal_eval(node.value)
+            except ValueError:
+                return None
+            return {"requires": [], **manifest}
+    return None
+
+def dependency_order(manifests: dict):
+    """Module names with every module after the ones it requires"""
+    ordered, visiting = [], set()
+
+    def visit(name, chain):
+        if name in ordered:
+            return
+        if name in visiting:
+            print(f"Module dependency cycle: {' -> '.join(chain + [name])}")
+            return
+        visiting.add(name)
+        for required in manifests[name]["requires"]:
+            if required in manifests:
+                visit(required, chain + [name])
+            else:
+                print(f"Module {name} requires unknown module {required}")
+        visiting.discard(name)
+        ordered.append(name)
+
+    for name in sorted(manifests):
+        visit(name, [])
+    return ordered
 
 class ModuleManager:
     def __init__(self):
         self.modules: Dict[str, BaseModule] = {}
-        self.log_history = []
-        self.max_logs = 100
+        self.notifications = NotificationLog()
         self.socket_manager = socket_manager
+        self.config = ConfigStore()
+        self.http = HttpService()
+        self.response_cache = ResponseCache()
+        self.assets = AssetStore()
+        self.state = StateSync()
+        self.spool = UploadSpool()
+        self.metrics = MetricsRegistry()
+        self.loop_monitor = LoopMonitor()
+        self.runtime = ModuleRuntime(self.metrics)
+        self.manifests = {}
+        self.startup_times = {} # module -> {"import_ms", "init_ms", "start_ms"}
+        self.boot_started = time.monotonic()
+        self.startup_task = None
 
     async def load_modules(self, modules_package):
-        """Dynamically loads all modules in the modules directory"""
+        """Discovers modules from their manifests, imports them concurrently
+        and constructs them in dependency order"""
+        # Modules read and subscribe to config as they are constructed
+        self.config.load()
+        package_dir = modules_package.__path__[0]
         for _, name, is_pkg in pkgutil.iter_modules(modules_package.__path__):
-            full_module_name = f"modules.{name}"
-            module = importlib.import_module(full_module_name)
-            
-            for attr_name in dir(module):
-                attr = getattr(module, attr_name)
-                if (isinstance(attr, type) and 
-                    issubclass(attr, BaseModule) and 
-                    attr is not BaseModule):
-                    
-                    instance = attr(self)
-                    self.modules[name] = instance
-                    print(f"Loaded module: {name}")
+            path = os.path.join(package_dir, name, "__init__.py") if is_pkg else os.path.join(package_dir, f"{name}.py")
+            manifest = read_manifest(path)
+            if manifest is None:
+                print(f"Skipping module {name}: no MANIFEST")
+                continue
+            self.manifests[name] = manifest
+
+        # Imports are independent of each other; overlap their disk reads
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(None, self.import_module, modules_package.__name__, name) for name in self.manifests),
+            return_exceptions=True
+        )
+        imported = dict(zip(self.manifests, results))
+
+        for name in dependency_order(self.manifests):
+            module = imported[name]
+            if isinstance(module, BaseException):
+                print(f"Failed to import module {name}: {module}")
+                continue
+            started = time.perf_counter()
+            try:
+                instance = getattr(module, self.manifests[name]["class"])(self)
+            except Exception as e:
+                print(f"Failed to create module {name}: {e}")
+                continue
+            instance.name = name
+            self.modules[name] = instance
+            self.startup_times[name]["init_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            print(f"Loaded module: {name}")
+
+    def import_module(self, package: str, name: str):
+        """Blocking; runs in an executor thread"""
+        started = time.perf_counter()
+        module = importlib.import_module(f"{package}.{name}")
+        self.startup_times[name] = {"import_ms": round((time.perf_counter() - started) * 1000, 1)}
+        return module
 
     async def start_all(self):
-        for name, module in self.modules.items():
-            asyncio.create_task(module.start())
+        config = self.config
+        # Executors first: everything below may already hand work to them
+        self.runtime.configure(config.get_dict("runtime"))
+        self.runtime.start()
+        await self.http.start(
+            config.get_str("base_url"),
+            http2=config.get_bool("http2"),
+            warmup=config.get_bool("http_warmup", True)
+        )
+        self.response_cache.configure(config.get_dict("cache"))
+        self.response_cache.load()
+        self.spool.configure(config.get_dict("spool"))
+        self.spool.load()
+        self.notifications.configure(config.get_dict("notifications"))
+        await self.notifications.load()
+        self.assets.configure(config.get_dict("assets"))
 
-    async def send_notification(self, message: str, type: str = "info"):
-        import datetime
-        now = datetime.datetime.now().strftime("%H:%M:%S")
-        
-        log_entry = {
-            "message": message,
-            "level": type,
-            "time": now
-        }
-        
-        # Add to history
-        self.log_history.append(log_entry)
-        if len(self.log_history) > self.max_logs:
-            self.log_history.pop(0)
+        self.loop_monitor.configure(config.get_dict("loop_monitor"))
+        self.loop_monitor.start(lambda state: self.publish_state(
+            "loop",
+            {**state, "runtime": self.runtime.get_state(), "assets": self.assets.get_state()},
+            droppable=True
+        ))
+
+        # Rebuild shared services only when their own keys change
+        config.subscribe(("base_url", "http2"), lambda c: self.http.configure(c.get_str("base_url"), c.get_bool("http2")), immediate=False)
+        config.subscribe(("cache",), lambda c: self.response_cache.configure(c.get_dict("cache")), immediate=False)
+        config.subscribe(("spool",), lambda c: self.spool.configure(c.get_dict("spool")), immediate=False)
+        config.subscribe(("loop_monitor",), lambda c: self.loop_monitor.configure(c.get_dict("loop_monitor")), immediate=False)
+        config.subscribe(("notifications",), lambda c: self.notifications.configure(c.get_dict("notifications")), immediate=False)
+        config.subscribe(("assets",), lambda c: self.assets.configure(c.get_dict("assets")), immediate=False)
+        config.subscribe(("runtime",), lambda c: self.runtime.resize(c.get_dict("runtime")), immediate=False)
+
+        self.startup_task = asyncio.create_task(self.start_modules())
+
+    async def start_modules(self):
+        """Starts every module as soon as the modules it requires have started"""
+        started = {name: asyncio.Event() for name in self.modules}
+
+        async def start_one(name, module):
+            for required in self.manifests[name]["requires"]:
+                if required in started:
+                    await started[required].wait()
+            began = time.perf_counter()
+            try:
+                await module.start()
+            except Exception as e:
+                print(f"Module {name} failed to start: {e}")
+            finally:
+                self.startup_times[name]["start_ms"] = round((time.perf_counter() - began) * 1000, 1)
+                started[name].set()
 
+        await asyncio.gather(*(
+            asyncio.create_task(attributed(name, start_one(name, module)), name=f"{module.__class__.__name__}.start")
+            for name, module in self.modules.items()
+        ))
+        self.report_startup()
+
+        # Warm the lazily imported libraries and image workers before the first button press needs them
+        await asyncio.gather(self.runtime.run("io", preload), self.runtime.run("io", self.runtime.warm))
+
+    async def stop_all(self):
+        """Stops modules in reverse dependency order, then the shared services"""
+        if self.startup_task and not self.startup_task.done():
+            self.startup_task.cancel()
+        for name in reversed(dependency_order({name: self.manifests[name] for name in self.modules})):
+            await self.runtime.stop_module(name, self.modules[name])
+            print(f"Stopped module: {name}")
+
+        await self.spool.stop()
+        if self.loop_monitor.probe_task:
+            self.loop_monitor.probe_task.cancel()
+        self.loop_monitor.uninstall()
+        await self.config.flush()
+        await self.notifications.flush()
+        await self.response_cache.flush()
+        await self.http.close()
+        self.runtime.shutdown()
+
+    def report_startup(self):
+        ready_ms = round((time.monotonic() - self.boot_started) * 1000)
+        print(f"Modules ready {ready_ms} ms after boot:")
+        for name, times in self.startup_times.items():
+            print(
+                f"  {name:<10} import {times.get('import_ms', 0):>7} ms  "
+                f"init {times.get('init_ms', 0):>7} ms  start {times.get('start_ms', 0):>7} ms"
+            )
+
+    def render_startup_metrics(self):
+        """Prometheus lines appended to /metrics"""
+        lines = [
+            "# HELP vgas_module_startup_seconds Time each module spent importing, constructing and starting",
+            "# TYPE vgas_module_startup_seconds gauge",
+        ]
+        for name, times in sorted(self.startup_times.items()):
+            for phase in ("import", "init", "start"):
+                if f"{phase}_ms" in times:
+                    lines.append(f'vgas_module_startup_seconds{{module="{name}",phase="{phase}"}} {times[f"{phase}_ms"] / 1000:.4f}')
+        return "\n".join(lines) + "\n"
+
+    async def send_notification(self, message: str, type: str = "info"):
+        log_entry = self.notifications.append(message, type)
         await socket_manager.broadcast({
             "type": "notification",
             "data": log_entry
         })
 
-    async def update_telemetry(self, data: dict):
+    async def publish_state(self, channel: str, state: dict, droppable: bool = False):
+        """Broadcasts only the fields of a channel's state that changed"""
+        change = self.state.commit(channel, state)
+        if change is None:
+            return
+        seq, prev, delta = change
+        # Under backpressure a client's droppable deltas are merged per channel, see ClientConnection
         await socket_manager.broadcast({
-            "type": "telemetry",
-            "data": data
-        })
+            "type": "state_delta",
+            "channel": channel,
+            "seq": seq,
+            "prev": prev,
+            "data": delta
+        }, droppable=droppable)
+
+    async def sync_module_states(self):
+        for name, module in self.modules.items():
+            if hasattr(module, 'get_state'):
+                await self.publish_state(name, module.get_state())
+
+    async def update_telemetry(self, data: dict):
+        for channel, state in data.items():
+            await self.publish_state(channel, state, droppable=True)
 
     async def execute_module_command(self, module_name: str, command: str, data: dict = None):
         module = self.modules.get(module_name)
         if module and hasattr(module, 'execute_command'):
-            return await module.execute_command(command, data)
+            # Anything this command blocks the loop with is charged to it
+            with owned(f"{module_name}.{command}"):
+                return await module.execute_command(command, data)
         return {"error": f"Module {module_name} not found or doesn't support commands"}
 
 module_manager = ModuleManager()
@@ -0,0 +1,277 @@
+import bisect
+import mmap
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Seconds; spans run from a few ms (cache lookup) to a minute (slow analysis)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# Bytes; a Pi Zero 2 has 512 MB in total
+RSS_BUCKETS = tuple(mb * 2**20 for mb in (48, 64, 96, 128, 192, 256, 384, 512, 768, 1024))
+
+METRIC_HELP = {
+    "vgas_workflow_stage_seconds": ("histogram", "Duration of each workflow stage"),
+    "vgas_workflow_stage_quantile_seconds": ("summary", "Recent p50/p95/p99 of each workflow stage"),
+    "vgas_workflows_total": ("counter", "Finished workflows by outcome"),
+    "vgas_workflow_errors_total": ("counter", "Failed workflows by the step that failed"),
+    "vgas_workflow_cancellations_total": ("counter", "Workflows cancelled by the user or a reset"),
+    "vgas_cache_lookups_total": ("counter", "Answer cache lookups by result"),
+    "vgas_task_restarts_total": ("counter", "Supervised module tasks restarted after a crash"),
+    "vgas_workflow_peak_rss_bytes": ("histogram", "Peak resident memory of the process while each workflow ran"),
+}
+
+# Spans derived from the marks image_to_speech sets on the HTTP exchange
+HTTP_STAGES = (
+    ("upload", "request", "body_sent"),
+    ("analysis", "body_sent", "headers"),
+    ("first_byte", "headers", "first_byte"),
+    ("download", "first_byte", "downloaded"),
+)
+
+class Trace:
+    """Timeline of one workflow: spans relative to the button press"""
+
+    def __init__(self, trace_id: str):
+        self.id = trace_id
+        self.started = time.monotonic()
+        self.wall_time = time.time()
+        self.spans = []
+        self.marks = {}
+        self.outcome = None
+        self.total = None
+        self.peak_rss = None # bytes, sampled by MemoryWatch
+
+    def add_span(self, stage: str, start: float, end: float):
+        self.spans.append({"stage": stage, "start": start, "end": end})
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_span(stage, start, time.monotonic())
+
+    def mark(self, name: str):
+        self.marks.setdefault(name, time.monotonic())
+
+    def spans_from_marks(self, stages):
+        for stage, start, end in stages:
+            if start in self.marks and end in self.marks:
+                self.add_span(stage, self.marks[start], self.marks[end])
+
+    def note_rss(self, rss: int):
+        if rss and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def finish(self, outcome: str):
+        self.outcome = outcome
+        self.total = time.monotonic() - self.started
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "time": time.strftime("%H:%M:%S", time.localtime(self.wall_time)),
+            "outcome": self.outcome,
+            "total_ms": round((self.total or 0) * 1000, 1),
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1) if self.peak_rss else None,
+            "spans": [
+                {
+                    "stage": span["stage"],
+                    "start_ms": round((span["start"] - self.started) * 1000, 1),
+                    "duration_ms": round((span["end"] - span["start"]) * 1000, 1)
+                }
+                for span in sorted(self.spans, key=lambda span: span["start"])
+            ]
+        }
+
+def httpx_trace(trace):
+    """httpx 'trace' extension marking when the upload finished and the reply began"""
+    async def hook(event_name, info):
+        if event_name.endswith("send_request_body.complete"):
+            trace.mark("body_sent")
+        elif event_name.endswith("receive_response_headers.complete"):
+            trace.mark("headers")
+    return hook
+
+def current_rss():
+    """Resident set size in bytes; /proc is far cheaper than psutil on a Pi"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, IndexError, ValueError):
+        import psutil
+        return psutil.Process().memory_info().rss
+
+class MemoryWatch:
+    """Samples RSS from a thread while workflows run, so each trace gets its
+    own peak; ru_maxrss only knows the peak of the whole process. The thread
+    sleeps while no workflow is being tracked."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.traces = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def track(self, trace):
+        trace.note_rss(current_rss())
+        with self.lock:
+            self.traces.add(trace)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="memory-watch", daemon=True)
+            self.thread.start()
+        self.wakeup.set()
+
+    def untrack(self, trace):
+        with self.lock:
+            if trace not in self.traces:
+                return
+            self.traces.discard(trace)
+        trace.note_rss(current_rss())
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            while True:
+                with self.lock:
+                    traces = list(self.traces)
+                if not traces:
+                    break
+                rss = current_rss()
+                for trace in traces:
+                    trace.note_rss(rss)
+                time.sleep(self.interval)
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a window of recent observations
+    for exact percentiles on the dashboard."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 512):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q: float):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+class MetricsRegistry:
+    """Counters and stage histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, trace_limit: int = 20):
+        self.counters = {}   # name -> {labels: value}
+        self.histograms = {} # stage -> Histogram
+        self.traces = deque(maxlen=trace_limit)
+        self.memory = MemoryWatch()
+        self.peak_rss = Histogram(RSS_BUCKETS)
+
+    def inc(self, name: str, labels: dict = None, value: float = 1):
+        key = tuple(sorted((labels or {}).items()))
+        series = self.counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, stage: str, seconds: float):
+        if stage not in self.histograms:
+            self.histograms[stage] = Histogram()
+        self.histograms[stage].observe(seconds)
+
+    def record_trace(self, trace, time_to_first_audio_ms=None):
+        self.memory.untrack(trace)
+        if trace.peak_rss:
+            self.peak_rss.observe(trace.peak_rss)
+        for span in trace.spans:
+            self.observe(span["stage"], span["end"] - span["start"])
+        if trace.total is not None:
+            self.observe("total", trace.total)
+        if time_to_first_audio_ms is not None:
+            self.observe("first_audio", time_to_first_audio_ms / 1000)
+        self.inc("vgas_workflows_total", {"outcome": trace.outcome})
+        self.traces.appendleft(trace.summary())
+
+    def stage_stats(self):
+        return {
+            stage: {
+                "count": histogram.count,
+                **{
+                    f"p{int(q * 100)}_ms": round(histogram.quantile(q) * 1000, 1)
+                    for q in QUANTILES
+                }
+            }
+            for stage, histogram in self.histograms.items() if histogram.recent
+        }
+
+    def get_state(self):
+        return {
+            "stages": self.stage_stats(),
+            "peak_rss_mb": {
+                f"p{int(q * 100)}": round(self.peak_rss.quantile(q) / 2**20, 1)
+                for q in QUANTILES
+            } if self.peak_rss.recent else None,
+            "traces": list(self.traces)
+        }
+
+    def render(self):
+        lines = []
+
+        def header(name):
+            kind, help_text = METRIC_HELP[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name in sorted(self.counters):
+            header(name)
+            for labels, value in sorted(self.counters[name].items()):
+                lines.append(f"{name}{format_labels(labels)} {value}")
+
+        if self.histograms:
+            name = "vgas_workflow_stage_seconds"
+            header(name)
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+            name = "vgas_workflow_stage_quantile_seconds"
+            header(name)
+            for stage, histogram in sorted(self.histograms.items()):
+                for q in QUANTILES:
+                    lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {histogram.quantile(q):.6f}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        if self.peak_rss.count:
+            name = "vgas_workflow_peak_rss_bytes"
+            header(name)
+            cumulative = 0
+            for bound, count in zip(self.peak_rss.buckets, self.peak_rss.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {self.peak_rss.count}')
+            lines.append(f'{name}_sum {self.peak_rss.sum:.0f}')
+            lines.append(f'{name}_count {self.peak_rss.count}')
+
+        return "\n".join(lines) + "\n"
@@ -1,4 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
+from core.loopmon import attributed
 
 class BaseModule(ABC):
     def __init__(self, manager):
@@ -13,6 +15,17 @@ class BaseModule(ABC):
     async def stop(self):
         pass
 
+    def create_task(self, coro, label: str = None):
+        """Starts a task whose loop time is attributed to this module in the loop monitor"""
+        owner = f"{self.name}.{label}" if label else self.name
+        task = asyncio.create_task(attributed(owner, coro), name=getattr(coro, "__qualname__", owner))
+        # Cancelled when the module is stopped
+        return self.manager.runtime.track(self.name, task)
+
+    def supervise(self, factory, label: str):
+        """Runs factory() for as long as the module lives, restarting it with backoff if it crashes"""
+        return self.manager.runtime.supervise(self.name, label, factory)
+
     async def notify(self, message: str, type: str = "info"):
         """Sends a notification to the dashboard"""
         await self.manager.send_notification(message, type)
@@ -0,0 +1,179 @@
+import asyncio
+import datetime
+import json
+import os
+import time
+from collections import deque
+from core.config_store import merge_settings
+
+class NotificationLog:
+    """Dashboard notifications: a ring of recent entries plus a disk log.
+
+    The ring is what new clients get replayed and never grows past
+    memory_entries. Every entry is also appended to a JSON-lines file,
+    written in batches off the loop and rotated by size, so older history
+    can be paged from disk without keeping it in memory. Entry ids increase
+    across restarts and serve as the paging cursor.
+    """
+
+    DEFAULTS = {
+        "memory_entries": 100,
+        "persist": True,
+        "max_file_kb": 512,  # rotate the current file past this size
+        "max_files": 5,      # current file plus rotated ones
+        "flush_delay": 1.0,  # seconds to batch entries before writing
+    }
+
+    def __init__(self, directory: str = "logs"):
+        self.directory = directory
+        self.settings = dict(self.DEFAULTS)
+        self.entries = deque(maxlen=self.settings["memory_entries"])
+        self.complete = True # False once an entry has left the ring (or was never loaded)
+        self.next_id = 1
+        self.pending = []    # entries not yet on disk
+        self.flush_handle = None
+        self.write_lock = None
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "notifications")
+        if self.entries.maxlen != self.settings["memory_entries"]:
+            if len(self.entries) > self.settings["memory_entries"]:
+                self.complete = False
+            self.entries = deque(self.entries, maxlen=self.settings["memory_entries"])
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, "notifications.jsonl")
+
+    def file_paths(self):
+        """Log files newest first"""
+        return [self.path] + [f"{self.path}.{index}" for index in range(1, self.settings["max_files"])]
+
+    async def load(self):
+        """Refills the ring from disk so history survives a restart"""
+        if not self.settings["persist"]:
+            return
+        loop = asyncio.get_event_loop()
+        try:
+            recent = await loop.run_in_executor(None, self.read_page, self.entries.maxlen + 1, None, None, None, None)
+        except OSError as e:
+            print(f"Notification log unreadable: {e}")
+            return
+        if recent:
+            self.next_id = recent[0]["id"] + 1
+            self.complete = len(recent) <= self.entries.maxlen
+            self.entries.extend(reversed(recent[:self.entries.maxlen]))
+
+    def append(self, message: str, level: str = "info"):
+        now = time.time()
+        entry = {
+            "id": self.next_id,
+            "ts": round(now, 3),
+            "time": datetime.datetime.fromtimestamp(now).strftime("%H:%M:%S"),
+            "level": level,
+            "message": message
+        }
+        self.next_id += 1
+        if len(self.entries) == self.entries.maxlen:
+            self.complete = False
+        self.entries.append(entry)
+        if self.settings["persist"]:
+            self.pending.append(entry)
+            self.schedule_flush()
+        return entry
+
+    def recent(self):
+        """Ring contents, newest first"""
+        return list(reversed(self.entries))
+
+    def schedule_flush(self):
+        if self.flush_handle:
+            return # One write per batch, not one per entry
+        loop = asyncio.get_running_loop()
+        self.flush_handle = loop.call_later(self.settings["flush_delay"], lambda: asyncio.create_task(self.flush()))
+
+    async def flush(self):
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.write_lock is None:
+            self.write_lock = asyncio.Lock()
+        async with self.write_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(None, self.write, batch)
+            except OSError as e:
+                print(f"Notification log write failed, {len(batch)} entries kept in memory only: {e}")
+
+    def write(self, batch):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in batch))
+            size = f.tell()
+        if size >= self.settings["max_file_kb"] * 1024:
+            self.rotate()
+
+    def rotate(self):
+        paths = self.file_paths()
+        if os.path.exists(paths[-1]):
+            os.remove(paths[-1])
+        for older, newer in zip(reversed(paths[1:]), reversed(paths[:-1])):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+
+    def matches(self, entry, levels, since, until):
+        return (
+            (not levels or entry["level"] in levels)
+            and (since is None or entry["ts"] >= since)
+            and (until is None or entry["ts"] <= until)
+        )
+
+    async def query(self, limit: int = 50, before: int = None, levels=None, since: float = None, until: float = None):
+        """A page of entries, newest first, older than the before id"""
+        page = [
+            entry for entry in reversed(self.entries)
+            if (before is None or entry["id"] < before) and self.matches(entry, levels, since, until)
+        ][:limit]
+        if len(page) < limit and not self.complete and self.settings["persist"]:
+            # Older than the ring: page through the files
+            await self.flush()
+            loop = asyncio.get_event_loop()
+            try:
+                page = await loop.run_in_executor(None, self.read_page, limit, before, levels, since, until)
+            except OSError as e:
+                print(f"Notification log unreadable: {e}")
+        return {
+            "entries": page,
+            "next_before": page[-1]["id"] if len(page) == limit else None
+        }
+
+    def read_page(self, limit, before, levels, since, until):
+        """Blocking; scans the files newest first, keeping only one page in memory"""
+        page = []
+        for path in self.file_paths():
+            if len(page) >= limit:
+                break
+            if not os.path.exists(path):
+                continue
+            newest = deque(maxlen=limit - len(page))
+            reached_since = False
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # Torn last line after a power cut
+                    if before is not None and entry["id"] >= before:
+                        break # Ids only grow, the rest of the file is newer still
+                    if since is not None and entry["ts"] < since:
+                        reached_since = True
+                        continue
+                    if self.matches(entry, levels, since, until):
+                        newest.append(entry)
+            page.extend(reversed(newest))
+            if reached_since:
+                break # Older files hold nothing newer than since
+        return page
@@ -0,0 +1,199 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from core.loopmon import attributed
+from core.lazy import preload
+from core.config_store import merge_settings
+
+class SupervisedTask:
+    """A long-running module task and its restart bookkeeping"""
+
+    def __init__(self, owner: str, label: str, factory, restart: bool):
+        self.owner = owner
+        self.label = label
+        self.factory = factory # () -> coroutine, called again for each restart
+        self.restart = restart
+        self.task = None
+        self.restarts = 0
+        self.last_error = None
+        self.started = None
+
+    @property
+    def name(self):
+        return f"{self.owner}.{self.label}"
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "running": bool(self.task and not self.task.done()),
+            "restarts": self.restarts,
+            "last_error": self.last_error
+        }
+
+class ModuleRuntime:
+    """Owns module tasks and the executors blocking work runs on.
+
+    Supervised tasks are restarted with exponential backoff when they crash.
+    Blocking work goes to a named executor rather than the shared default:
+    "image" does scoring and JPEG encoding, "io" takes file and psutil reads
+    (and is also the loop's default executor), and "audio" is one thread that
+    owns the mixer, so a burst of image work can never queue ahead of a
+    pause or stop.
+
+    The image pool is threads by default since Pillow and numpy release the
+    GIL for the heavy parts; image_pool "process" moves the work out of the
+    controller process, with frames handed over through shared memory.
+    """
+
+    DEFAULTS = {
+        "image_pool": "thread",   # thread or process
+        "image_workers": 2,
+        "io_workers": 4,
+        "restart_delay": 1.0,     # seconds before the first restart
+        "max_restart_delay": 60.0,
+        "stable_after": 60.0,     # a task that ran this long restarts without backoff
+        "stop_timeout": 5.0,      # seconds a module gets to stop before it is cancelled
+    }
+
+    def __init__(self, metrics=None):
+        self.settings = dict(self.DEFAULTS)
+        self.metrics = metrics
+        self.executors = {}
+        self.supervised = {} # name -> SupervisedTask
+        self.tasks = {}      # module name -> set of plain tasks it started
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "runtime")
+
+    @property
+    def image_processes(self):
+        return isinstance(self.executors.get("image"), ProcessPoolExecutor)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self.executors["io"] = ThreadPoolExecutor(self.settings["io_workers"], thread_name_prefix="io")
+        self.executors["audio"] = ThreadPoolExecutor(1, thread_name_prefix="audio")
+        self.executors["image"] = self.create_image_pool()
+        loop.set_default_executor(self.executors["io"])
+
+    def resize(self, settings=None):
+        """Applies new pool settings while running. Pools whose size or kind
+        changed are replaced; work already queued on the old one finishes there."""
+        previous = self.settings
+        self.configure(settings)
+        if not self.executors:
+            return
+        if self.settings["io_workers"] != previous["io_workers"]:
+            old = self.executors["io"]
+            self.executors["io"] = ThreadPoolExecutor(self.settings["io_workers"], thread_name_prefix="io")
+            asyncio.get_running_loop().set_default_executor(self.executors["io"])
+            old.shutdown(wait=False)
+        if any(self.settings[key] != previous[key] for key in ("image_workers", "image_pool")):
+            old = self.executors["image"]
+            self.executors["image"] = self.create_image_pool()
+            old.shutdown(wait=False)
+        print(f"Worker pools: {self.settings['io_workers']} io, {self.settings['image_workers']} image ({self.settings['image_pool']})")
+
+    def create_image_pool(self):
+        workers = self.settings["image_workers"]
+        if self.settings["image_pool"] == "process":
+            try:
+                # forkserver: workers never inherit the camera or GPIO threads
+                return ProcessPoolExecutor(
+                    workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                    initializer=preload,
+                    initargs=(("PIL.Image", "numpy"),)
+                )
+            except (OSError, ValueError) as e:
+                print(f"Image process pool unavailable, using threads: {e}")
+        return ThreadPoolExecutor(workers, thread_name_prefix="image")
+
+    def warm(self):
+        """Blocking; starts the image workers so the first capture does not wait for them"""
+        if self.image_processes:
+            self.executors["image"].submit(time.monotonic).result()
+
+    async def run(self, executor: str, function, *args):
+        """Runs a blocking function on the named executor"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executors[executor], function, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM killer, crash in a C extension); replace the pool and retry once
+            print(f"Executor {executor} broke, starting a new one")
+            self.executors[executor] = self.create_image_pool()
+            return await loop.run_in_executor(self.executors[executor], function, *args)
+
+    def track(self, owner: str, task):
+        """Remembers a module's task so stopping the module cancels it"""
+        tasks = self.tasks.setdefault(owner, set())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    def supervise(self, owner: str, label: str, factory, restart: bool = True):
+        """Runs factory() as a task of module owner, starting it again if it crashes"""
+        entry = SupervisedTask(owner, label, factory, restart)
+        self.supervised[entry.name] = entry
+        entry.task = asyncio.create_task(attributed(entry.name, self.run_supervised(entry)), name=entry.name)
+        return entry
+
+    async def run_supervised(self, entry):
+        delay = self.settings["restart_delay"]
+        while True:
+            entry.started = time.monotonic()
+            try:
+                await entry.factory()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                entry.last_error = f"{e.__class__.__name__}: {e}"
+                print(f"Task {entry.name} crashed: {entry.last_error}")
+                if not entry.restart:
+                    return
+
+            if time.monotonic() - entry.started >= self.settings["stable_after"]:
+                delay = self.settings["restart_delay"]
+            entry.restarts += 1
+            if self.metrics:
+                self.metrics.inc("vgas_task_restarts_total", {"task": entry.name})
+            print(f"Restarting {entry.name} in {delay:.1f}s (restart #{entry.restarts})")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.settings["max_restart_delay"])
+
+    async def stop_module(self, name: str, module):
+        """Calls module.stop() with a timeout, then cancels whatever it left running"""
+        timeout = self.settings["stop_timeout"]
+        try:
+            await asyncio.wait_for(module.stop(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Module {name} did not stop within {timeout}s")
+        except Exception as e:
+            print(f"Module {name} failed to stop: {e}")
+
+        tasks = [entry.task for entry in self.supervised.values() if entry.owner == name]
+        tasks += list(self.tasks.pop(name, ()))
+        pending = [task for task in tasks if task and not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            done, still_running = await asyncio.wait(pending, timeout=timeout)
+            for task in still_running:
+                print(f"Task {task.get_name()} ignored cancellation")
+
+    def shutdown(self):
+        for name, executor in self.executors.items():
+            # Queued work is dropped; running work finishes in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.executors.clear()
+
+    def get_state(self):
+        return {
+            "image_pool": "process" if self.image_processes else "thread",
+            "workers": {"io": self.settings["io_workers"], "image": self.settings["image_workers"]},
+            "tasks": [entry.summary() for entry in self.supervised.values()]
+        }
@@ -1,49 +1,322 @@
-from fastapi import WebSocket
-from typing import List, Dict
+import asyncio
+import itertools
 import json
+import time
+from collections import deque
+from fastapi import WebSocket
+from typing import Dict
+from core.state import merge_delta
+
+# Optional compact binary codec, negotiated per client with /ws?codec=msgpack
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+def encode(message: dict, codec: str):
+    if codec == "msgpack":
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message)
+
+class ClientConnection:
+    """One dashboard socket with its own bounded outgoing queue and sender task"""
+
+    def __init__(self, websocket: WebSocket, client_id: int, max_queue: int, codec: str = "json", max_inflight: int = 4):
+        self.websocket = websocket
+        self.id = client_id
+        self.codec = codec
+        self.max_queue = max_queue
+        self.queue = deque() # (frame, droppable, message); message is set for state frames
+        self.stale = set()   # channels whose deltas were dropped, resent whole once the queue drains
+        self.wakeup = asyncio.Event()
+        self.sender_task = None
+        self.commands = set() # command tasks running or waiting for a slot
+        self.command_slots = asyncio.Semaphore(max_inflight)
+        self.sent = 0
+        self.dropped = 0
+        self.merged = 0
+        self.last_send_ms = 0.0
+        self.avg_send_ms = 0.0
+
+    def enqueue(self, frame, droppable: bool = False, message: dict = None):
+        """Queues a frame. Returns False if the client cannot keep up.
+
+        message is the state delta the frame encodes, if it is one. A
+        droppable delta is merged into its channel's queued one instead of
+        taking another slot. A delta that has to be dropped marks its channel
+        stale; the channel's full state follows once the queue has drained,
+        so the client never sees a gap it would have to resync for.
+        """
+        channel = message["channel"] if message else None
+        if channel in self.stale:
+            return True # Superseded by the full state that follows
+        if droppable and channel:
+            index = self.last_index(channel)
+            if index is not None and self.queue[index][1]:
+                # Nothing else for this channel is queued after it, so the merged delta can stay in its place
+                queued = self.queue[index][2]
+                merged = {**message, "prev": queued["prev"], "data": merge_delta(queued["data"], message["data"])}
+                self.queue[index] = (encode(merged, self.codec), True, merged)
+                self.merged += 1
+                return True
+
+        if len(self.queue) >= self.max_queue:
+            # Drop the oldest telemetry frame to make room, newer data supersedes it
+            for index, (_, queued_droppable, queued) in enumerate(self.queue):
+                if queued_droppable:
+                    del self.queue[index]
+                    self.dropped += 1
+                    if queued:
+                        self.mark_stale(queued["channel"])
+                    break
+            else:
+                if droppable:
+                    self.dropped += 1
+                    if channel:
+                        self.mark_stale(channel)
+                    return True
+                return False
+            if channel in self.stale:
+                return True
+
+        self.queue.append((frame, droppable, message))
+        self.wakeup.set()
+        return True
+
+    def last_index(self, channel: str):
+        for index in range(len(self.queue) - 1, -1, -1):
+            message = self.queue[index][2]
+            if message and message["channel"] == channel:
+                return index
+        return None
+
+    def mark_stale(self, channel: str):
+        # Later deltas of the channel chain onto the dropped one, so they go too
+        self.queue = deque(entry for entry in self.queue if not (entry[2] and entry[2]["channel"] == channel))
+        self.stale.add(channel)
+
+    def restore_stale(self):
+        """Queues the full state of every stale channel"""
+        from core.manager import module_manager
+        for channel in sorted(self.stale):
+            seq, state = module_manager.state.channel_state(channel)
+            message = {"type": "state_channel", "channel": channel, "seq": seq, "data": state}
+            self.queue.append((encode(message, self.codec), False, message))
+        self.stale.clear()
+
+    async def run(self, send_timeout: float):
+        """Drains the queue; raises on a dead or stalled socket"""
+        while True:
+            if self.stale and len(self.queue) <= self.max_queue // 2:
+                self.restore_stale()
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            frame, _, _ = self.queue.popleft()
+            started = time.monotonic()
+            if isinstance(frame, bytes):
+                send = self.websocket.send_bytes(frame)
+            else:
+                send = self.websocket.send_text(frame)
+            await asyncio.wait_for(send, timeout=send_timeout)
+            self.last_send_ms = (time.monotonic() - started) * 1000
+            # Exponential moving average keeps the figure stable between samples
+            self.avg_send_ms = self.last_send_ms if not self.sent else 0.8 * self.avg_send_ms + 0.2 * self.last_send_ms
+            self.sent += 1
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "codec": self.codec,
+            "queue": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "commands": len(self.commands),
+            "last_send_ms": round(self.last_send_ms, 1),
+            "avg_send_ms": round(self.avg_send_ms, 1)
+        }
 
 class ConnectionManager:
+    MAX_QUEUE = 256 # must fit the initial state + log history replay
+    SEND_TIMEOUT = 5.0 # seconds a single send may stall before the client is evicted
+    DROPPABLE_TYPES = {"telemetry"}
+    MAX_INFLIGHT = 4   # commands from one client executing at once
+    MAX_PENDING = 32   # commands from one client executing or waiting, beyond which they are refused
+    MAX_BATCH = 16     # commands accepted in one batch frame
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.client_ids = itertools.count(1)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, codec: str = "json"):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        
-        # Send current module states (e.g., Vision process sync)
+        if codec == "msgpack" and not HAS_MSGPACK:
+            print("msgpack codec requested but not installed, falling back to JSON")
+            codec = "json"
+
+        # Bring the versioned states up to date before this client is registered,
+        # so the snapshot below is the first thing it sees
+        from core.manager import module_manager
+        await module_manager.sync_module_states()
+
+        client = ClientConnection(websocket, next(self.client_ids), self.MAX_QUEUE, codec, self.MAX_INFLIGHT)
+        self.clients[websocket] = client
+        client.sender_task = asyncio.create_task(self.run_sender(client))
+
+        await self.send_snapshot(websocket)
+
+        # Recent notifications in one frame, newest first; older ones come from /logs
+        history = module_manager.notifications.recent()
+        if history:
+            await self.send_personal_message({
+                "type": "notification_history",
+                "data": history
+            }, websocket)
+
+    async def handle_message(self, websocket: WebSocket, payload: dict):
+        """Dispatches one inbound frame: resync, command or batch of commands.
+
+        Commands run as their own tasks, so a slow one (check_updates) does
+        not hold up the next frame. Each command carrying an "id" gets a
+        "result" or "error" frame echoing that id; commands without one are
+        fire-and-forget as before.
+        """
+        client = self.clients.get(websocket)
+        if not client:
+            return
+        kind = payload.get("type")
+        if kind == "resync":
+            await self.send_snapshot(websocket)
+        elif kind == "command":
+            self.submit(client, payload)
+        elif kind == "batch":
+            commands = payload.get("commands")
+            if not isinstance(commands, list):
+                self.reply_error(client, payload, "bad_request", "batch needs a commands list")
+                return
+            for request in commands[self.MAX_BATCH:]:
+                self.reply_error(client, request, "too_many", f"at most {self.MAX_BATCH} commands per batch")
+            for request in commands[:self.MAX_BATCH]:
+                self.submit(client, request)
+        else:
+            self.reply_error(client, payload, "bad_request", f"unknown message type {kind!r}")
+
+    def submit(self, client: ClientConnection, request):
+        if not isinstance(request, dict) or not request.get("module") or not request.get("command"):
+            self.reply_error(client, request, "bad_request", "command needs module and command")
+            return
+        if len(client.commands) >= self.MAX_PENDING:
+            self.reply_error(client, request, "busy", f"{self.MAX_PENDING} commands already pending")
+            return
+        task = asyncio.create_task(self.run_command(client, request), name=f"ws{client.id}.{request['command']}")
+        client.commands.add(task)
+        task.add_done_callback(client.commands.discard)
+
+    async def run_command(self, client: ClientConnection, request: dict):
         from core.manager import module_manager
-        for name, module in module_manager.modules.items():
-            if hasattr(module, 'get_state'):
-                state = module.get_state()
-                await self.send_personal_message({
-                    "type": f"{name}_update",
-                    "data": state
-                }, websocket)
-
-        # Send log history to the newly connected client
-        if module_manager.log_history:
-            for log in reversed(module_manager.log_history):
-                await self.send_personal_message({
-                    "type": "notification",
-                    "data": {
-                        "message": log["message"],
-                        "level": log["level"],
-                        "time": log["time"]
-                    }
-                }, websocket)
+        module_name, command = request["module"], request["command"]
+        module = module_manager.modules.get(module_name)
+        if not module or not hasattr(module, "execute_command"):
+            self.reply_error(client, request, "unknown_module", f"Module {module_name} not found or doesn't support commands")
+            return
+
+        # A client that disconnects mid-command does not cancel it; the reply is just not sent
+        async with client.command_slots:
+            started = time.monotonic()
+            try:
+                result = await module_manager.execute_module_command(module_name, command, request.get("data"))
+            except Exception as e:
+                print(f"WS command {module_name}.{command} failed: {e}")
+                self.reply_error(client, request, "failed", f"{e.__class__.__name__}: {e}")
+                return
+            duration_ms = round((time.monotonic() - started) * 1000, 1)
+
+        if isinstance(result, dict) and "error" in result:
+            # Modules report refusals (unknown command, unknown workflow) as {"error": ...}
+            self.reply_error(client, request, "rejected", str(result["error"]), duration_ms)
+        else:
+            self.reply(client, request, {"type": "result", "data": result, "duration_ms": duration_ms})
+
+    def reply(self, client: ClientConnection, request, message: dict):
+        request_id = request.get("id") if isinstance(request, dict) else None
+        if request_id is None or client.websocket not in self.clients:
+            return
+        self.enqueue(client, self.encode({
+            "id": request_id,
+            "module": request.get("module"),
+            "command": request.get("command"),
+            **message
+        }, client.codec))
+
+    def reply_error(self, client: ClientConnection, request, code: str, message: str, duration_ms: float = None):
+        error = {"type": "error", "error": {"code": code, "message": message}}
+        if duration_ms is not None:
+            error["duration_ms"] = duration_ms
+        self.reply(client, request, error)
+
+    async def run_sender(self, client: ClientConnection):
+        try:
+            await client.run(self.SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            print(f"WS client {client.id} stalled for {self.SEND_TIMEOUT}s, evicting")
+            await self.evict(client)
+        except Exception as e:
+            print(f"WS client {client.id} send failed: {e}")
+            await self.evict(client)
+
+    async def evict(self, client: ClientConnection):
+        self.disconnect(client.websocket)
+        try:
+            await client.websocket.close()
+        except Exception:
+            pass
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client and client.sender_task and client.sender_task is not asyncio.current_task():
+            client.sender_task.cancel()
+
+    def encode(self, message: dict, codec: str):
+        return encode(message, codec)
+
+    def enqueue(self, client: ClientConnection, frame, droppable: bool = False, message: dict = None):
+        if not client.enqueue(frame, droppable, message):
+            print(f"WS client {client.id} queue full ({client.max_queue}), evicting")
+            asyncio.create_task(self.evict(client))
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_text(json.dumps(message))
+        client = self.clients.get(websocket)
+        if client:
+            self.enqueue(client, self.encode(message, client.codec))
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                pass
+    async def send_snapshot(self, websocket: WebSocket):
+        """Full versioned state, sent on connect and when a client reports a gap"""
+        from core.manager import module_manager
+        await self.send_personal_message({
+            "type": "state_snapshot",
+            **module_manager.state.snapshot()
+        }, websocket)
+
+    async def broadcast(self, message: dict, droppable: bool = None):
+        if not self.clients:
+            return
+        if droppable is None:
+            droppable = message.get("type") in self.DROPPABLE_TYPES
+        # Serialize once per codec, every client's sender task delivers it concurrently
+        frames = {}
+        state = message if message.get("type") == "state_delta" else None
+        for client in list(self.clients.values()):
+            if client.codec not in frames:
+                frames[client.codec] = self.encode(message, client.codec)
+            self.enqueue(client, frames[client.codec], droppable, state)
+
+    def stats(self):
+        return [client.stats() for client in self.clients.values()]
 
 socket_manager = ConnectionManager()
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from core.config_store import merge_settings
+
+class UploadSpool:
+    """Disk-backed spool of analyze uploads that failed for network reasons.
+
+    Each entry is the encoded JPEG plus a JSON metadata file, so questions
+    survive a reboot. Both are written atomically, the JPEG first, so an
+    entry on disk is complete once its metadata exists. Entries are retried with exponential backoff and full
+    jitter; the first success means the server is reachable again, so every
+    waiting entry becomes due and the spool drains with bounded concurrency.
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "max_entries": 50,
+        "concurrency": 2,
+        "base_delay": 5,     # seconds before the first retry
+        "min_delay": 1,      # floor under a jittered retry delay
+        "max_delay": 300,    # backoff ceiling in seconds
+        "max_attempts": 20,
+    }
+
+    def __init__(self, directory: str = "spool"):
+        self.directory = directory
+        self.settings = dict(self.DEFAULTS)
+        self.entries = {} # id -> metadata
+        self.in_flight = set()
+        self.attempts = set() # attempt tasks, cancelled on stop()
+        # Created in configure(), once an event loop is running
+        self.semaphore = None
+        self.wakeup = None
+        self.sender = None    # async (data, entry) -> (audio, error, retryable)
+        self.on_result = None # async (entry, data, audio, error)
+        self.task = None
+
+    def configure(self, settings=None):
+        self.settings = merge_settings(self.DEFAULTS, settings, "spool")
+        self.semaphore = asyncio.Semaphore(self.settings["concurrency"])
+        if self.wakeup is None:
+            self.wakeup = asyncio.Event()
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        names = os.listdir(self.directory)
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r") as f:
+                    entry = json.load(f)
+                if os.path.exists(self.data_path(entry["id"])):
+                    self.entries[entry["id"]] = entry
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Upload spool entry {name} unreadable: {e}")
+        # A JPEG without metadata is an add() cut short; nothing would ever send it
+        tracked = {f"{entry_id}.jpg" for entry_id in self.entries} | {f"{entry_id}.json" for entry_id in self.entries}
+        for name in names:
+            if name.endswith(".tmp") or (name.endswith((".jpg", ".json")) and name not in tracked):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        if self.entries:
+            print(f"Upload spool loaded: {len(self.entries)} pending questions")
+
+    def data_path(self, entry_id: str):
+        return os.path.join(self.directory, f"{entry_id}.jpg")
+
+    def meta_path(self, entry_id: str):
+        return os.path.join(self.directory, f"{entry_id}.json")
+
+    def start(self, sender, on_result):
+        self.sender = sender
+        self.on_result = on_result
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def add(self, data: bytes, metadata: dict):
+        """Persists a frame for later upload. Returns the entry, or None if disabled."""
+        if not self.settings["enabled"]:
+            return None
+
+        while len(self.entries) >= self.settings["max_entries"]:
+            oldest = min(self.entries.values(), key=lambda entry: entry["created"])
+            print(f"Upload spool full, dropping {oldest['id']}")
+            await self.remove(oldest)
+
+        now = time.time()
+        entry = {
+            **metadata,
+            "id": str(uuid.uuid4()),
+            "created": now,
+            "attempts": 0,
+            "next_attempt": now + self.settings["base_delay"],
+            "size": len(data),
+            "last_error": None
+        }
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, self.write_entry, entry, data)
+        except OSError as e:
+            print(f"Upload spool write failed: {e}")
+            return None
+
+        self.entries[entry["id"]] = entry
+        self.wakeup.set()
+        return entry
+
+    async def run(self):
+        while True:
+            now = time.time()
+            waiting = [entry for entry in self.entries.values() if entry["id"] not in self.in_flight]
+            for entry in waiting:
+                if entry["next_attempt"] <= now:
+                    self.in_flight.add(entry["id"])
+                    task = asyncio.create_task(self.attempt(entry))
+                    self.attempts.add(task)
+                    task.add_done_callback(self.attempts.discard)
+
+            pending = [entry["next_attempt"] for entry in waiting if entry["id"] not in self.in_flight]
+            timeout = max(0.0, min(pending) - now) if pending else None
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def attempt(self, entry):
+        loop = asyncio.get_event_loop()
+        try:
+            async with self.semaphore:
+                data = await loop.run_in_executor(None, self.read_data, entry["id"])
+                try:
+                    audio, error, retryable = await self.sender(data, entry)
+                except Exception as e:
+                    audio, error, retryable = None, str(e), True
+        except OSError as e:
+            print(f"Upload spool read failed: {e}")
+            await self.remove(entry)
+            return
+        finally:
+            self.in_flight.discard(entry["id"])
+
+        if entry["id"] not in self.entries:
+            return # Dropped while in flight
+
+        if audio:
+            await self.remove(entry)
+            # The server is reachable again: stop waiting out the other backoffs
+            now = time.time()
+            for other in self.entries.values():
+                other["next_attempt"] = min(other["next_attempt"], now)
+            self.wakeup.set()
+            await self.on_result(entry, data, audio, None)
+            return
+
+        entry["attempts"] += 1
+        entry["last_error"] = error
+        if not retryable or entry["attempts"] >= self.settings["max_attempts"]:
+            await self.remove(entry)
+            await self.on_result(entry, data, None, error)
+            return
+
+        # Exponential backoff with full jitter so several devices do not retry in lockstep
+        ceiling = min(self.settings["max_delay"], self.settings["base_delay"] * (2 ** entry["attempts"]))
+        entry["next_attempt"] = time.time() + max(self.settings["min_delay"], random.uniform(0, ceiling))
+        print(f"Spooled upload {entry['id'][:8]} failed ({error}), retry #{entry['attempts']} in {entry['next_attempt'] - time.time():.0f}s")
+        await loop.run_in_executor(None, self.write_meta, entry)
+        self.wakeup.set()
+
+    async def stop(self):
+        """Cancels the scheduler and any uploads in flight; their entries stay on disk"""
+        tasks = [task for task in [self.task, *self.attempts] if task and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.task = None
+
+    async def remove(self, entry):
+        self.entries.pop(entry["id"], None)
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.delete_entry, entry["id"])
+
+    def write_entry(self, entry, data):
+        os.makedirs(self.directory, exist_ok=True)
+        self.write_atomic(self.data_path(entry["id"]), data)
+        self.write_meta(entry)
+
+    def write_meta(self, entry):
+        self.write_atomic(self.meta_path(entry["id"]), json.dumps(entry).encode("utf-8"))
+
+    def write_atomic(self, path, data):
+        """Temp file + fsync + rename, so a power cut leaves the old file or the new one"""
+        fd, temp_path = tempfile.mkstemp(prefix=".spool-", suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def read_data(self, entry_id):
+        with open(self.data_path(entry_id), "rb") as f:
+            return f.read()
+
+    def delete_entry(self, entry_id):
+        for path in (self.data_path(entry_id), self.meta_path(entry_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        now = time.time()
+        oldest = min((entry["created"] for entry in self.entries.values()), default=None)
+        return {
+            "entries": len(self.entries),
+            "in_flight": len(self.in_flight),
+            "size_kb": sum(entry["size"] for entry in self.entries.values()) // 1024,
+            "oldest_age_s": int(now - oldest) if oldest else 0
+        }
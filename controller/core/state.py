@@ -0,0 +1,66 @@
+import copy
+
+def diff_state(old: dict, new: dict):
+    """Returns the fields of new that differ from old. Nested dicts are diffed
+    recursively, anything else is replaced whole; removed keys map to None."""
+    delta = {}
+    for key, value in new.items():
+        if key not in old:
+            delta[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested = diff_state(old[key], value)
+            if nested:
+                delta[key] = nested
+        elif old[key] != value:
+            delta[key] = value
+    for key in old:
+        if key not in new:
+            delta[key] = None
+    return delta
+
+def merge_delta(older: dict, newer: dict):
+    """One delta with the effect of applying older then newer, merged the
+    way the dashboard applies them: nested dicts merge, anything else replaces"""
+    merged = dict(older)
+    for key, value in newer.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_delta(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+class StateSync:
+    """Last published state per channel plus a global sequence number.
+
+    Every committed change bumps seq by one and records it as the channel's
+    version. A delta carries its channel's previous version as prev, so a
+    client can tell a missed delta from one that was merged with the next.
+    """
+
+    def __init__(self):
+        self.channels = {}
+        self.versions = {} # channel -> seq of its last change
+        self.seq = 0
+
+    def commit(self, channel: str, state: dict):
+        """Stores the new state and returns (seq, prev, delta), or None if nothing changed"""
+        previous = self.channels.get(channel, {})
+        delta = diff_state(previous, state)
+        if not delta and channel in self.channels:
+            return None
+
+        self.channels[channel] = copy.deepcopy(state)
+        self.seq += 1
+        prev, self.versions[channel] = self.versions.get(channel, 0), self.seq
+        return self.seq, prev, delta
+
+    def channel_state(self, channel: str):
+        """(version, full state) of one channel"""
+        return self.versions.get(channel, 0), copy.deepcopy(self.channels.get(channel, {}))
+
+    def snapshot(self):
+        return {
+            "seq": self.seq,
+            "versions": dict(self.versions),
+            "data": copy.deepcopy(self.channels)
+        }
@@ -0,0 +1,128 @@
+import math
+import time
+from array import array
+
+# name, seconds per point, points kept
+DEFAULT_TIERS = [
+    ("5s", 5, 720),       # 1 hour
+    ("1m", 60, 720),      # 12 hours
+    ("10m", 600, 1008),   # 7 days
+]
+
+class RingSeries:
+    """Fixed-size time series: one preallocated array of doubles per field,
+    so a week of samples costs about a hundred KB and no per-sample objects."""
+
+    def __init__(self, fields, capacity: int):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.values = {field: array("d", [math.nan]) * capacity for field in self.fields}
+        self.next = 0
+        self.count = 0
+
+    def append(self, timestamp: float, sample: dict):
+        index = self.next
+        self.times[index] = timestamp
+        for field in self.fields:
+            value = sample.get(field)
+            self.values[field][index] = math.nan if value is None else value
+        self.next = (index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    @property
+    def oldest(self):
+        if not self.count:
+            return None
+        return self.times[(self.next - self.count) % self.capacity]
+
+    def window(self, start: float, end: float, fields=None):
+        """Points with start <= time <= end, oldest first. Gaps come back as None."""
+        fields = fields or self.fields
+        times = []
+        series = {field: [] for field in fields}
+        for offset in range(self.count):
+            index = (self.next - self.count + offset) % self.capacity
+            timestamp = self.times[index]
+            if timestamp < start or timestamp > end:
+                continue
+            times.append(round(timestamp, 1))
+            for field in fields:
+                value = self.values[field][index]
+                series[field].append(None if math.isnan(value) else round(value, 2))
+        return times, series
+
+class TelemetryHistory:
+    """Raw samples land in the finest tier; coarser tiers receive the mean of
+    each of their intervals as soon as it closes."""
+
+    def __init__(self, fields, tiers=None):
+        self.fields = list(fields)
+        self.tiers = [
+            {"name": name, "step": step, "series": RingSeries(self.fields, capacity), "bucket": None}
+            for name, step, capacity in (tiers or DEFAULT_TIERS)
+        ]
+        # Running sums for the interval each coarse tier is currently filling
+        for tier in self.tiers[1:]:
+            tier["sums"] = dict.fromkeys(self.fields, 0.0)
+            tier["counts"] = dict.fromkeys(self.fields, 0)
+
+    def add(self, sample: dict, timestamp: float = None):
+        timestamp = timestamp or time.time()
+        self.tiers[0]["series"].append(timestamp, sample)
+
+        for tier in self.tiers[1:]:
+            bucket = int(timestamp // tier["step"])
+            if tier["bucket"] is not None and bucket != tier["bucket"]:
+                self.flush(tier)
+            tier["bucket"] = bucket
+            for field in self.fields:
+                value = sample.get(field)
+                if value is not None:
+                    tier["sums"][field] += value
+                    tier["counts"][field] += 1
+
+    def flush(self, tier):
+        averages = {
+            field: tier["sums"][field] / tier["counts"][field]
+            for field in self.fields if tier["counts"][field]
+        }
+        # Stamped at the middle of the interval it summarises
+        tier["series"].append((tier["bucket"] + 0.5) * tier["step"], averages)
+        tier["sums"] = dict.fromkeys(self.fields, 0.0)
+        tier["counts"] = dict.fromkeys(self.fields, 0)
+
+    def pick_tier(self, start: float, end: float, max_points: int):
+        """Finest tier that reaches back to start within max_points"""
+        for tier in self.tiers:
+            series = tier["series"]
+            # A tier that never wrapped still holds everything since boot
+            covers = series.count < series.capacity or series.oldest <= start + tier["step"]
+            if (end - start) / tier["step"] <= max_points and covers:
+                return tier
+        return self.tiers[-1]
+
+    def query(self, window: float = 3600, end: float = None, fields=None, tier: str = None, max_points: int = 720):
+        end = end or time.time()
+        start = end - window
+        fields = [field for field in (fields or self.fields) if field in self.fields]
+        selected = next((t for t in self.tiers if t["name"] == tier), None) or self.pick_tier(start, end, max_points)
+        times, series = selected["series"].window(start, end, fields)
+
+        # Thin out evenly rather than truncate if the tier is still too dense
+        if len(times) > max_points:
+            stride = math.ceil(len(times) / max_points)
+            times = times[::stride]
+            series = {field: values[::stride] for field, values in series.items()}
+
+        return {
+            "tier": selected["name"],
+            "step": selected["step"],
+            "start": round(start, 1),
+            "end": round(end, 1),
+            "t": times,
+            "series": series
+        }
+
+    def stats(self):
+        return {tier["name"]: tier["series"].count for tier in self.tiers}
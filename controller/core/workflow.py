@@ -0,0 +1,48 @@
+import asyncio
+import time
+import uuid
+from core.metrics import Trace
+
+class WorkflowJob:
+    """One button press: capture -> analyze -> speak, with its own state.
+
+    States: queued, capturing, analyzing, ready, playing, done, failed,
+    spooled (saved for a later upload) and cancelled
+    """
+
+    FINAL_STATES = ("done", "failed", "spooled", "cancelled")
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.state = "queued"
+        self.status = "Waiting in queue"
+        self.step = "camera" # camera, ai, audio, idle
+        self.has_error = False
+        self.finished = False
+        self.cancelled = False
+        self.image = None # Asset ID
+        self.audio = None # Asset ID
+        self.assets = [] # Asset IDs pinned in the store until the job ends
+        self.frame = None # Frame metadata (size, hash, quality); the bytes are in the asset store
+        self.audio_buffer = None # AudioStreamBuffer while streaming
+        self.prepare_task = None
+        self.analysis_task = None
+        self.created_at = time.monotonic()
+        self.capture_ms = None # ms to get a frame from the camera
+        self.quality = None # Score of the uploaded frame
+        self.time_to_first_audio = None # ms from trigger to playback start
+        self.trace = Trace(self.id)
+        self.ready = asyncio.Event() # audio can be played, or the job failed
+        self.done = asyncio.Event()
+
+    @property
+    def is_final(self):
+        return self.state in self.FINAL_STATES
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "status": self.status,
+            "step": self.step
+        }
@@ -2,14 +2,16 @@ import asyncio
 import os
 import json
 import uvicorn
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 
 import modules
 from core.manager import module_manager
 from core.socket import socket_manager
+from core.assets import parse_range
+from core.loopmon import owned
 
 from contextlib import asynccontextmanager
 
@@ -19,7 +21,8 @@ async def lifespan(app: FastAPI):
     await module_manager.load_modules(modules)
     await module_manager.start_all()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    await module_manager.stop_all()
 
 app = FastAPI(title="VGAS Controller", lifespan=lifespan)
 
@@ -33,35 +36,123 @@ app.add_middleware(
 )
 
 @app.get("/config")
-async def get_config():
+async def get_config(response: Response):
     config_module = module_manager.modules.get("config")
     if config_module:
+        response.headers["X-Config-Version"] = str(module_manager.config.version)
         return config_module.config
     return {"error": "Config module not found"}
 
 @app.post("/config")
-async def update_config(config: dict):
+async def update_config(config: dict, response: Response):
     config_module = module_manager.modules.get("config")
     if config_module:
-        updated = config_module.save_config(config)
+        with owned("config.save_config"):
+            updated = config_module.save_config(config)
+        response.headers["X-Config-Version"] = str(module_manager.config.version)
         await module_manager.send_notification("Configuration updated successfully", "success")
         return updated
     return {"error": "Config module not found"}
 
+@app.get("/assets/{asset_id}")
+async def get_asset(asset_id: str, request: Request, encoding: str = None):
+    asset = module_manager.assets.get(asset_id)
+    if not asset:
+        return Response(status_code=404)
+
+    # Asset IDs are content hashes, so they never change once issued
+    etag = f'"{asset_id}-base64"' if encoding == "base64" else f'"{asset_id}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if encoding == "base64":
+        # For clients that can only take text; encoded per request, never stored
+        headers.pop("Accept-Ranges")
+        return Response(content=module_manager.assets.base64(asset_id), media_type="text/plain", headers=headers)
+
+    data = asset["data"]
+    size = asset["size"]
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return Response(content=data, media_type=asset["media_type"], headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(
+        content=data[start:end + 1],
+        status_code=206,
+        media_type=asset["media_type"],
+        headers=headers
+    )
+
+@app.get("/telemetry/history")
+async def get_telemetry_history(
+    window: float = 3600,
+    end: float = None,
+    fields: str = None,
+    tier: str = None,
+    max_points: int = 720
+):
+    """Downsampled system metrics for trend charts, e.g. ?window=43200&fields=cpu_temp"""
+    system_module = module_manager.modules.get("system")
+    if not system_module:
+        return {"error": "System module not found"}
+    return system_module.history.query(
+        window=min(max(window, 60), 7 * 24 * 3600),
+        end=end,
+        fields=fields.split(",") if fields else None,
+        tier=tier,
+        max_points=min(max(max_points, 10), 2000)
+    )
+
+@app.get("/logs")
+async def get_logs(
+    limit: int = 50,
+    before: int = None,
+    level: str = None,
+    since: float = None,
+    until: float = None
+):
+    """Notification history newest first, e.g. ?level=warning,error&before=<next_before>"""
+    return await module_manager.notifications.query(
+        limit=min(max(limit, 1), 500),
+        before=before,
+        levels=level.split(",") if level else None,
+        since=since,
+        until=until
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of workflow stage timings and counters"""
+    return Response(
+        content=(
+            module_manager.metrics.render()
+            + module_manager.loop_monitor.render_metrics()
+            + module_manager.render_startup_metrics()
+        ),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await socket_manager.connect(websocket)
+    await socket_manager.connect(websocket, websocket.query_params.get("codec", "json"))
     try:
         while True:
             data = await websocket.receive_text()
             try:
                 payload = json.loads(data)
-                if payload.get("type") == "command":
-                    module_name = payload.get("module")
-                    command = payload.get("command")
-                    cmd_data = payload.get("data")
-                    result = await module_manager.execute_module_command(module_name, command, cmd_data)
-                    # Optional: Send result back
+                # Commands are dispatched as tasks; replies arrive as "result"/"error" frames
+                await socket_manager.handle_message(websocket, payload)
             except Exception as e:
                 print(f"WS Error: {e}")
     except WebSocketDisconnect:
@@ -0,0 +1,202 @@
+import asyncio
+import time
+from collections import deque
+from core.module import BaseModule
+from core.camera import CameraStream, create_backend, DEMO_IMAGE_URL
+from core.config_store import merge_settings
+
+MANIFEST = {
+    "class": "CameraModule",
+    "requires": [],
+}
+
+class CameraSource:
+    """One camera. Frames stream into a ring buffer so capture() only has to
+    pick the newest one instead of opening the sensor on demand."""
+
+    def __init__(self, name: str, settings: dict, on_first_frame):
+        self.name = name
+        self.settings = settings
+        self.on_first_frame = on_first_frame # async (source)
+        self.stream = None
+        self.loop = asyncio.get_running_loop()
+        self.frame_event = asyncio.Event()
+        self.latencies = deque(maxlen=20) # ms, most recent captures
+        self.last_capture = None
+
+    @property
+    def channel(self):
+        return "camera" if self.name == "default" else f"camera/{self.name}"
+
+    def on_frame(self):
+        # Capture thread: hand the wakeup to the loop
+        self.loop.call_soon_threadsafe(self.frame_ready)
+
+    def frame_ready(self):
+        self.frame_event.set()
+        stream = self.stream
+        if stream and stream.ring.seq <= 1:
+            # First frame or failed open: the dashboard should know
+            asyncio.create_task(self.on_first_frame(self))
+
+    def open(self):
+        """Raises ValueError for an unknown or unavailable backend"""
+        backend = create_backend(self.settings)
+        self.stream = CameraStream(backend, self.settings, self.on_frame)
+        self.stream.start()
+
+    async def capture(self, count: int = 1):
+        """Returns the newest frames as a dict with image (the newest), images
+        (up to count recent frames, newest first), latency_ms and age_ms, or None"""
+        started = time.monotonic()
+        if not self.stream:
+            return None
+
+        max_age = self.settings["max_frame_age_ms"] / 1000
+        frame = self.stream.ring.latest()
+        if not frame or started - frame["time"] > max_age:
+            # Still warming up or stalled: wait for the next frame off the sensor
+            seq = frame["seq"] if frame else 0
+            deadline = started + self.settings["capture_timeout"]
+            while True:
+                frame = self.stream.ring.latest()
+                if frame and frame["seq"] > seq:
+                    break
+                remaining = deadline - time.monotonic()
+                failed = self.stream.error and not self.stream.ring.seq
+                if remaining <= 0 or failed or not self.stream.running:
+                    print(f"Camera {self.name} capture timed out ({self.stream.error or 'no frames'})")
+                    return None
+                self.frame_event.clear()
+                try:
+                    await asyncio.wait_for(self.frame_event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+        # A burst is whatever fresh frames the ring already holds
+        frames = self.stream.ring.recent(count, max_age) or [frame]
+        captured = time.monotonic()
+        latency_ms = round((captured - started) * 1000, 2)
+        self.latencies.append(latency_ms)
+        self.last_capture = {
+            "seq": frame["seq"],
+            "frames": len(frames),
+            "latency_ms": latency_ms,
+            "age_ms": round((captured - frame["time"]) * 1000, 1)
+        }
+        print(f"Captured {len(frames)} frame(s) up to {frame['seq']} in {latency_ms} ms (age {self.last_capture['age_ms']} ms)")
+        return {
+            **self.last_capture,
+            "image": frame["image"],
+            "images": [recent["image"] for recent in frames]
+        }
+
+    def get_state(self):
+        stream = self.stream
+        latencies = sorted(self.latencies)
+        return {
+            "backend": stream.backend.name if stream else None,
+            "running": bool(stream and stream.running),
+            "error": stream.error if stream else None,
+            "fps": stream.fps if stream else 0,
+            "buffered": len(stream.ring) if stream else 0,
+            "last_capture": self.last_capture,
+            "latency": {
+                "avg_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "max_ms": latencies[-1] if latencies else None,
+                "samples": len(latencies)
+            }
+        }
+
+class CameraModule(BaseModule):
+    """Owns the cameras: "default" from the camera config, plus one per
+    entry of the cameras config for multi-station setups. Entries override
+    the camera settings, e.g. {"desk2": {"backend": "url", "url": ...}}."""
+
+    DEFAULTS = {
+        "backend": "auto",          # auto, picamera2, file, url, synthetic
+        "resolution": [2028, 1520],
+        "fps": 2,
+        "ring_size": 4,
+        "warmup_frames": 3,
+        "max_frame_age_ms": 1500,   # older frames mean the stream stalled
+        "capture_timeout": 5,       # seconds to wait for a fresh frame
+        "reopen_delay": 2,          # seconds before retrying a failed open, doubling
+        "max_reopen_delay": 60,
+        "path": "test_images",      # file backend: an image or a directory
+        "url": DEMO_IMAGE_URL,      # url backend
+    }
+
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.sources = {} # name -> CameraSource
+
+    def load_settings(self):
+        """{source name: settings} from the camera and cameras config"""
+        config = self.manager.config
+        base = merge_settings(self.DEFAULTS, config.get_dict("camera"), "camera")
+        settings = {"default": base}
+        for name, overrides in (config.get_dict("cameras") or {}).items():
+            if isinstance(overrides, dict):
+                settings[name] = merge_settings(base, overrides, f"cameras.{name}")
+        return settings
+
+    async def open_streams(self):
+        for name, settings in self.load_settings().items():
+            source = CameraSource(name, settings, self.publish)
+            try:
+                source.open()
+            except ValueError as e:
+                print(e)
+                await self.notify(f"Camera {name} error: {e}", "error")
+            self.sources[name] = source
+
+    async def close_streams(self):
+        sources, self.sources = self.sources, {}
+        streams = [source.stream for source in sources.values() if source.stream]
+        await asyncio.gather(*(self.manager.runtime.run("io", stream.stop) for stream in streams))
+
+    async def restart(self):
+        await self.close_streams()
+        await self.open_streams()
+        for source in self.sources.values():
+            await self.publish(source)
+
+    async def capture(self, count: int = 1, source: str = "default"):
+        """Newest frames from the named camera, see CameraSource.capture"""
+        camera = self.sources.get(source)
+        if not camera:
+            print(f"Photo error: no camera named {source}")
+            return None
+        frame = await camera.capture(count)
+        await self.publish(camera)
+        return frame
+
+    def get_state(self):
+        source = self.sources.get("default")
+        return source.get_state() if source else {}
+
+    async def publish(self, source: CameraSource):
+        await self.manager.publish_state(source.channel, source.get_state())
+
+    async def execute_command(self, command: str, data: dict = None):
+        if command == "restart_camera":
+            await self.restart()
+            await self.notify("Camera restarted", "info")
+            return {"status": "ok"}
+        return {"error": f"Unknown command: {command}"}
+
+    async def start(self):
+        print("Camera module started")
+        await self.open_streams()
+        for source in self.sources.values():
+            await self.publish(source)
+        # Reopen the sensors with the new backend settings when they change
+        self.manager.config.subscribe(("camera", "cameras"), self.on_config_change, immediate=False)
+
+    def on_config_change(self, config):
+        self.create_task(self.restart(), "restart")
+
+    async def stop(self):
+        self.manager.config.unsubscribe(self.on_config_change)
+        await self.close_streams()
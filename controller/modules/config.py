@@ -1,43 +1,33 @@
-import json
-import os
 from core.module import BaseModule
 
+# Read by ModuleManager without importing this file
+MANIFEST = {
+    "class": "ConfigModule",
+    "requires": [],
+}
+
 class ConfigModule(BaseModule):
+    """Dashboard-facing side of the shared ConfigStore (manager.config)"""
+
     def __init__(self, manager):
         super().__init__(manager)
-        self.config_path = "config.json"
-        self.config = self.load_config()
+        self.store = manager.config
 
-    def load_config(self):
-        if os.path.exists(self.config_path):
-            try:
-                with open(self.config_path, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        return {
-            "api_key": "",
-            "base_url": "",
-            "active_prompt": "index"
-        }
+    @property
+    def config(self):
+        # What the user saved; the governor's overrides stay out of the form
+        return self.store.base
 
     def save_config(self, new_config):
-        self.config.update(new_config)
-        with open(self.config_path, 'w') as f:
-            json.dump(self.config, f)
-            
-        # Push update to other modules if they have api_base_url attribute
-        new_base_url = self.config.get("base_url")
-        if new_base_url:
-            for module in self.manager.modules.values():
-                if hasattr(module, "api_base_url"):
-                    module.api_base_url = new_base_url
-                    print(f"Propagated new base_url to {module.__class__.__name__}")
-                    
-        return self.config
+        # Subscribers rebuild whatever depends on the keys that changed;
+        # the file is written off the loop once edits settle.
+        changed = self.store.update(new_config)
+        if changed:
+            print(f"Config v{self.store.version}: changed {', '.join(sorted(changed))}")
+        return self.store.base
 
     async def start(self):
-        print("Config module loaded")
+        print(f"Config module loaded (v{self.store.version})")
 
     async def stop(self):
-        pass
+        await self.store.flush()
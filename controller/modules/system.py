@@ -1,15 +1,52 @@
 import asyncio
 import psutil
 import os
+from core.governor import PROFILE_ORDER, PowerGovernor
 from core.module import BaseModule
+from core.telemetry import TelemetryHistory
+
+MANIFEST = {
+    "class": "SystemModule",
+    "requires": [],
+}
 
 class SystemModule(BaseModule):
+    SAMPLE_INTERVAL = 5 # seconds, matches the finest history tier; power profiles stretch it
+    HISTORY_FIELDS = ["cpu_percent", "cpu_temp", "ram_percent", "disk_percent", "battery_percent"]
+
     def __init__(self, manager):
         super().__init__(manager)
         self.CURRENT_VERSION = "1.2.4"
         self.latest_version = "1.2.4"
         self.update_available = False
         self.last_telemetry = {}
+        self.history = TelemetryHistory(self.HISTORY_FIELDS)
+        self.governor = PowerGovernor(manager.config)
+        self.manager.config.subscribe(("base_url", "telemetry"), self.apply_config)
+        self.manager.config.subscribe(("governor",), self.on_governor_config)
+
+    def apply_config(self, config):
+        self.api_base_url = config.get_str("base_url")
+        telemetry = config.get_dict("telemetry") or {}
+        try:
+            self.interval = max(1.0, float(telemetry.get("interval", self.SAMPLE_INTERVAL)))
+        except (TypeError, ValueError):
+            self.interval = self.SAMPLE_INTERVAL
+
+    def on_governor_config(self, config):
+        self.governor.configure(config.get_dict("governor"))
+        if self.governor.inputs is not None:
+            # A new mode or thresholds apply now rather than at the next sample
+            self.create_task(self.govern(), "governor")
+
+    async def govern(self, inputs=None):
+        """Feeds a reading to the governor and reports a profile change"""
+        previous = self.governor.profile
+        entry = self.governor.update(inputs)
+        if entry:
+            stricter = PROFILE_ORDER.index(entry["to"]) > PROFILE_ORDER.index(previous)
+            await self.notify(f"Power profile: {entry['to']} ({entry['reason']})", "warning" if stricter else "info")
+        await self.manager.publish_state("governor", self.governor.get_state())
 
     def get_cpu_temp(self):
         # Specific for Raspberry Pi
@@ -27,37 +64,43 @@ class SystemModule(BaseModule):
             pass
         return 45.0 # Mock fallback
 
+    def read_sample(self):
+        """Blocking; runs in an executor thread"""
+        return {
+            "battery": psutil.sensors_battery(),
+            "ram": psutil.virtual_memory(),
+            "disk": psutil.disk_usage('/'),
+            "cpu_temp": self.get_cpu_temp(),
+            "cpu_percent": psutil.cpu_percent(interval=None) # Since the previous call
+        }
+
     async def start(self):
         print("System module started")
-        
-        # Initialize API Base URL from config
-        config_module = self.manager.modules.get("config")
-        self.api_base_url = config_module.config.get("base_url", "") if config_module else ""
 
         # Check for updates once on startup
         asyncio.create_task(self.check_for_updates())
-        
+        # start() returns right away so modules that depend on this one are not held up
+        self.supervise(self.sample_loop, "sampler")
+
+    async def sample_loop(self):
         while True:
             try:
-                # Battery
-                battery = psutil.sensors_battery()
+                # psutil and sysfs reads can stall on a busy SD card; keep them off the loop
+                sample = await self.manager.runtime.run("io", self.read_sample)
+                self.history.add({
+                    "cpu_percent": sample["cpu_percent"],
+                    "cpu_temp": sample["cpu_temp"],
+                    "ram_percent": sample["ram"].percent,
+                    "disk_percent": sample["disk"].percent,
+                    "battery_percent": sample["battery"].percent if sample["battery"] else None
+                })
+
+                battery = sample["battery"]
                 bat_percent = int(battery.percent) if battery else 85
                 power_plugged = battery.power_plugged if battery else True
-
-                # RAM
-                ram = psutil.virtual_memory()
-                ram_percent = int(ram.percent)
-                ram_total = round(ram.total / (1024**3), 1)
-                ram_used = round(ram.used / (1024**3), 1)
-
-                # Disk
-                disk = psutil.disk_usage('/')
-                disk_percent = int(disk.percent)
-                disk_total = round(disk.total / (1024**3), 1)
-                disk_used = round(disk.used / (1024**3), 1)
-
-                # CPU Temp
-                cpu_temp = self.get_cpu_temp()
+                ram = sample["ram"]
+                disk = sample["disk"]
+                cpu_temp = sample["cpu_temp"]
 
                 self.last_telemetry = {
                     "battery": {
@@ -65,18 +108,22 @@ class SystemModule(BaseModule):
                         "charging": power_plugged
                     },
                     "ram": {
-                        "percent": ram_percent,
-                        "total": ram_total,
-                        "used": ram_used
+                        "percent": int(ram.percent),
+                        "total": round(ram.total / (1024**3), 1),
+                        "used": round(ram.used / (1024**3), 1)
                     },
                     "disk": {
-                        "percent": disk_percent,
-                        "total": disk_total,
-                        "used": disk_used
+                        "percent": int(disk.percent),
+                        "total": round(disk.total / (1024**3), 1),
+                        "used": round(disk.used / (1024**3), 1)
                     },
                     "cpu": {
-                        "temp": round(cpu_temp, 1)
+                        "temp": round(cpu_temp, 1),
+                        "percent": round(sample["cpu_percent"], 1)
                     },
+                    "cache": self.manager.response_cache.stats(),
+                    "spool": self.manager.spool.stats(),
+                    "connections": self.manager.socket_manager.stats(),
                     "version": self.CURRENT_VERSION,
                     "latest_version": self.latest_version,
                     "update_available": self.update_available
@@ -85,17 +132,25 @@ class SystemModule(BaseModule):
                 await self.manager.update_telemetry({
                     "system": self.last_telemetry
                 })
-                
-                if bat_percent < 20:
-                    await self.notify("Warning: Battery is low!", "warning")
-                
-                if cpu_temp > 75:
-                    await self.notify("Alert: CPU temperature is high!", "warning")
+
+                await self.govern({
+                    "battery_percent": bat_percent if battery else None,
+                    "charging": power_plugged,
+                    "cpu_temp": round(cpu_temp, 1)
+                })
+
+                # With the governor on, its profile changes are the alerts
+                if not self.governor.settings["enabled"]:
+                    if bat_percent < 20:
+                        await self.notify("Warning: Battery is low!", "warning")
+
+                    if cpu_temp > 75:
+                        await self.notify("Alert: CPU temperature is high!", "warning")
 
             except Exception as e:
                 print(f"Error in SystemModule: {e}")
                 
-            await asyncio.sleep(5) # Faster updates for system metrics
+            await asyncio.sleep(self.interval)
 
     async def check_for_updates(self):
         """Fetches the latest version from the web API"""
@@ -104,28 +159,25 @@ class SystemModule(BaseModule):
             return { "error": "No Base URL" }
 
         print(f"Checking for updates from {self.api_base_url}...")
-        api_url = f"{self.api_base_url.rstrip('/')}/api/version"
         
         try:
-            import httpx
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(api_url)
-                if response.status_code == 200:
-                    data = response.json()
-                    self.latest_version = data.get("version", self.CURRENT_VERSION)
-                    self.update_available = self.latest_version != self.CURRENT_VERSION
-                    
-                    if self.update_available:
-                        changelog = data.get("changelog", [])
-                        msg = f"Update Available: v{self.latest_version} is now out!"
-                        if changelog:
-                            msg += f" (Features: {', '.join(changelog[:2])}...)"
-                        await self.notify(msg, "info")
-                    else:
-                        await self.notify("System is already at the latest version", "success")
+            response = await self.manager.http.request("GET", "/api/version")
+            if response.status_code == 200:
+                data = response.json()
+                self.latest_version = data.get("version", self.CURRENT_VERSION)
+                self.update_available = self.latest_version != self.CURRENT_VERSION
+                
+                if self.update_available:
+                    changelog = data.get("changelog", [])
+                    msg = f"Update Available: v{self.latest_version} is now out!"
+                    if changelog:
+                        msg += f" (Features: {', '.join(changelog[:2])}...)"
+                    await self.notify(msg, "info")
                 else:
-                    print(f"Update check failed: {response.status_code}")
-                    await self.notify("Failed to check for updates: Server error", "warning")
+                    await self.notify("System is already at the latest version", "success")
+            else:
+                print(f"Update check failed: {response.status_code}")
+                await self.notify("Failed to check for updates: Server error", "warning")
         except Exception as e:
             print(f"Update check error: {e}")
             await self.notify(f"Update check error: {str(e)}", "warning")
@@ -152,10 +204,31 @@ class SystemModule(BaseModule):
         if command == "perform_update":
             result = await self.perform_update()
             return result
+        if command == "governor_mode":
+            mode = (data or {}).get("mode")
+            if mode != "auto" and mode not in PROFILE_ORDER:
+                return {"error": f"Unknown mode: {mode}"}
+            # Saved like any setting, so a pinned profile survives a restart
+            config = self.manager.config
+            config.update({"governor": {**(config.get_dict("governor") or {}), "mode": mode}})
+            return self.governor.get_state()
+        if command == "profiler_start":
+            data = data or {}
+            monitor = self.manager.loop_monitor
+            if not monitor.start_profiler(data.get("interval_ms", 5), data.get("duration", 30)):
+                return {"error": "Loop monitor is disabled"}
+            await self.notify("Profiler started: sampling the event loop", "info")
+            await self.manager.publish_state("loop", monitor.get_state())
+            return {"status": "started"}
+        if command == "profiler_stop":
+            self.manager.loop_monitor.stop_profiler()
+            await asyncio.sleep(0.05) # Let the sampler thread exit
+            await self.manager.publish_state("loop", self.manager.loop_monitor.get_state())
+            return {"status": "stopped"}
         return {"error": "Unknown command"}
 
     def get_state(self):
         return self.last_telemetry
 
     async def stop(self):
-        pass
+        pass # The runtime cancels the sampler
@@ -1,164 +1,229 @@
 import asyncio
-import io
 import time
-import httpx
-import uuid
-import base64
-from PIL import Image
+from collections import deque
 from core.module import BaseModule
-
-# Mock GPIO for non-Pi environments
-try:
-    import RPi.GPIO as GPIO
-    IS_PI = True
-except (ImportError, RuntimeError):
-    class MockGPIO:
-        BCM = 'BCM'
-        IN = 'IN'
-        PUD_UP = 'PUD_UP'
-        LOW = 'LOW'
-        def setmode(self, mode): pass
-        def setup(self, pin, mode, pull_up_down=None): pass
-        def input(self, pin): return 1 # Always return HIGH (not pressed)
-        def cleanup(self): pass
-    
-    GPIO = MockGPIO()
-    IS_PI = False
-
-try:
-    import pygame
-    HAS_PYGAME = True
-except ImportError:
-    HAS_PYGAME = False
-
-class VisionModule(BaseModule):
-    def __init__(self, manager):
-        super().__init__(manager)
-        self.BUTTON_PIN = 17
-        self.is_processing = False
-        self.audio_state = "idle" # idle, playing, paused
-        self.stop_audio_event = False
-        self.cancel_workflow = False
-        self.has_error = False
-        self.workflow_finished = False
-        self.current_step = "idle" # camera, ai, audio, idle
-        self.status_message = "System Standby - Ready for Command"
-        self.last_image = None # Base64 string
-        self.last_audio = None # Base64 string
-        self.current_workflow_id = None
-        # Initialize API Base URL from config
-        config_module = self.manager.modules.get("config")
-        self.api_base_url = config_module.config.get("base_url", "") if config_module else ""
-
-        if HAS_PYGAME:
-            pygame.mixer.init()
-
-        if IS_PI:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self.BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-
-    async def update_status(self, status, step=None, has_error=None, finished=None):
-        """Sends vision process status to dashboard"""
-        if step: self.current_step = step
-        if has_error is not None: self.has_error = has_error
-        if finished is not None: self.workflow_finished = finished
-        self.status_message = status
+from core.audio_stream import AudioStreamBuffer
+from core.audio_engine import AudioEngine
+from core.imaging import SharedFrames, prepare_frame, preprocess_options, score_frames
+from core.quality import quality_options
+from core.metrics import httpx_trace, HTTP_STAGES
+from core.gpio import GPIO, IS_PI, ButtonInput
+from core.workflow import WorkflowJob
+from core.http import is_transient_error
+
+MANIFEST = {
+    "class": "VisionModule",
+    "requires": ["camera"],
+}
+
+class Station:
+    """One desk: a button, a camera source, an audio sink and a prompt, with
+    its own job queue and dashboard channel.
+
+    Stations share the manager's HTTP pool, caches and executors, and so
+    the server at base_url. Settings in CONFIG_KEYS from the station's
+    config entry override the top-level keys of the same name, so a station
+    only lists what differs, e.g.
+    {"id": "desk2", "button_pin": 27, "camera": "desk2", "active_prompt": "summary",
+     "audio": {"sink": "process", "command": ["mpg123", "-q", "-a", "hw:1,0", "-"]}}
+    """
+
+    IDLE_STATUS = "System Standby - Ready for Command"
+    BUTTON_PIN = 17
+    CONFIG_KEYS = (
+        "api_key", "active_prompt", "stream_audio", "audio_prebuffer_kb",
+        "max_queued_jobs", "preprocess", "quality", "audio"
+    )
+
+    def __init__(self, module, station_id: str, settings: dict = None):
+        self.module = module
+        self.manager = module.manager
+        self.id = station_id
+        self.settings = settings or {} # This station's overrides of the shared config
+        self.label = self.settings.get("name", station_id)
+        self.camera = self.settings.get("camera", "default") # CameraModule source name
+        # The single-desk setup keeps the channels the dashboard always used
+        self.channel = "vision" if station_id == "default" else f"vision/{station_id}"
+        self.audio_channel = "audio" if station_id == "default" else f"audio/{station_id}"
+        self.jobs = deque() # Active WorkflowJobs in press order, jobs[0] is spoken next
+        self.last_job = None # Most recent finished job, shown until the next press
+        self.player_task = None
+        self.capture_lock = asyncio.Lock() # One capture at a time per station
+        # Sink is opened in start(), off the loop
+        self.audio = AudioEngine(self.manager.runtime, self.on_audio_update)
+        self.idle_status = self.IDLE_STATUS
+        self.spool_results = deque(maxlen=5) # Answers to questions sent after reconnecting
+        # Settings are cached here and refreshed only when their config keys change
+        self.manager.config.subscribe(self.CONFIG_KEYS + ("base_url",), self.apply_config)
+
+    async def notify(self, message: str, type: str = "info"):
+        if self.module.multi_station:
+            message = f"{self.label}: {message}"
+        await self.module.notify(message, type)
+
+    def create_task(self, coro, label: str):
+        return self.module.create_task(coro, f"{self.id}.{label}")
+
+    @property
+    def is_processing(self):
+        return bool(self.jobs)
+
+    def view_job(self):
+        """The job the dashboard follows: the head of the queue, else the last one"""
+        return self.jobs[0] if self.jobs else self.last_job
+
+    async def update_status(self, status, step=None, has_error=None, finished=None, job=None):
+        """Updates a job's status (the viewed job by default) and syncs the dashboard"""
+        job = job or self.view_job()
+        if job:
+            if step: job.step = step
+            if has_error is not None: job.has_error = has_error
+            if finished is not None: job.finished = finished
+            job.status = status
+        else:
+            self.idle_status = status
         
-        await self.manager.socket_manager.broadcast({
-            "type": "vision_update",
-            "data": {
-                "status": self.status_message,
-                "step": self.current_step,
-                "is_processing": self.is_processing,
-                "audio_state": self.audio_state,
-                "has_error": self.has_error,
-                "workflow_finished": self.workflow_finished,
-                "assets": {
-                    "image": self.last_image,
-                    "audio": self.last_audio
-                }
-            }
-        })
-        print(f"Vision state updated: {self.current_step}, processing={self.is_processing}, error={self.has_error}")
-
-    def take_a_photo(self):
-        try:
-            # Using httpx for photo capture too for consistency if needed, but requests is fine for static images
-            import requests
-            response = requests.get('https://cdn.dont-ping.me/api/🐭🦕🙃👻🤖.JPEG', timeout=10)
-            if response.status_code == 200:
-                return Image.open(io.BytesIO(response.content))
+        await self.manager.publish_state(self.channel, self.get_state())
+        if job:
+            print(f"Vision {self.id} state updated: {job.id[:8]} {job.state}/{job.step}, queued={len(self.jobs)}, error={job.has_error}")
+
+    async def take_a_photo(self, job):
+        """Returns a burst of recent frames, newest first, or None"""
+        camera = self.manager.modules.get("camera")
+        if not camera:
+            print("Photo error: camera module not loaded")
             return None
-        except Exception as e:
-            print(f"Photo error: {e}")
+        quality = self.quality
+        frame = await camera.capture(quality["burst_size"] if quality["enabled"] else 1, self.camera)
+        if not frame:
             return None
-
-    async def play_audio(self, audio_content):
-        if not HAS_PYGAME:
+        job.capture_ms = frame["latency_ms"]
+        return frame["images"]
+
+    def apply_config(self, config):
+        self.api_base_url = config.get_str("base_url") # Shared: the HTTP pool only talks to one server
+        config = config.overlay({k: v for k, v in self.settings.items() if k in self.CONFIG_KEYS})
+        self.api_key = config.get_str("api_key")
+        self.active_prompt = config.get_str("active_prompt", "analyze")
+        self.stream_audio = config.get_bool("stream_audio", True)
+        self.prebuffer_bytes = int(config.get_float("audio_prebuffer_kb", 32) * 1024)
+        self.max_queue = config.get_int("max_queued_jobs", 3)
+        self.preprocess = preprocess_options(config.get_dict("preprocess"))
+        self.quality = quality_options(config.get_dict("quality"))
+        self.audio.configure(config.get_dict("audio"))
+
+    async def on_audio_update(self, state):
+        """Playback position for the dashboard, throttled by the engine"""
+        job = self.jobs[0] if self.jobs and self.jobs[0].state == "playing" else None
+        await self.manager.publish_state(self.audio_channel, {**state, "workflow_id": job.id if job else None}, droppable=True)
+
+    async def play_audio(self, audio_content, job=None):
+        """Plays raw audio bytes or an AudioStreamBuffer that is still downloading"""
+        if not self.audio.available:
             print("Pygame not available, skipping audio play.")
             return
-        
-        try:
-            audio_stream = io.BytesIO(audio_content)
-            pygame.mixer.music.load(audio_stream)
-            pygame.mixer.music.play()
-            
-            self.audio_state = "playing"
-            self.stop_audio_event = False
-            
-            await self.update_status("Speaking...", "audio")
 
-            while pygame.mixer.music.get_busy() or self.audio_state == "paused":
-                if self.stop_audio_event or self.cancel_workflow:
-                    pygame.mixer.music.stop()
-                    break
-                await asyncio.sleep(0.1)
+        try:
+            source = audio_content
+            if not isinstance(source, AudioStreamBuffer):
+                source = AudioStreamBuffer.from_bytes(audio_content)
+            if not await self.audio.play(source):
+                return
+
+            if job:
+                job.time_to_first_audio = int((time.monotonic() - job.created_at) * 1000)
+                print(f"Time to first audio: {job.time_to_first_audio} ms")
+                job.trace.mark("playing")
+                if "ready" in job.trace.marks:
+                    job.trace.add_span("queue", job.trace.marks["ready"], job.trace.marks["playing"])
             
-            self.audio_state = "idle"
-            self.stop_audio_event = False
-            if not self.cancel_workflow:
-                await self.update_status("Speaking finished", "idle")
+            await self.update_status("Speaking...", "audio", job=job)
+
+            # Woken by the end-of-track event, audio_stop or a cancel
+            await self.audio.wait()
+            if job:
+                job.trace.add_span("playback", job.trace.marks["playing"], time.monotonic())
+            if not (job and job.cancelled):
+                await self.update_status("Speaking finished", "idle", job=job)
         except Exception as e:
             print(f"Audio error: {e}")
-            self.audio_state = "idle"
+            await self.audio.stop()
 
-    async def image_to_speech(self, image_obj, workflow_id):
-        img_byte_arr = io.BytesIO()
-        image_obj.save(img_byte_arr, format='JPEG')
-        img_byte_arr.seek(0)
-        
-        config_module = self.manager.modules.get("config")
-        api_key = config_module.config.get("api_key", "") if config_module else ""
-        img_data = img_byte_arr.getvalue()
+    def api_error_message(self, response):
+        try:
+            error_data = response.json()
+            return error_data.get("message", response.text)
+        except:
+            return response.text
+
+    async def image_to_speech(self, img_data, workflow_id, audio_buffer=None, prompt=None, trace=None):
+        """Uploads the encoded JPEG to /api/analyze. When audio_buffer is given
+        the response is streamed into it chunk by chunk as it downloads.
+
+        Returns (audio, error, retryable); retryable marks network failures and
+        5xx responses that are worth spooling for a later attempt. A trace gets
+        upload, analysis, first byte and download spans."""
+        api_key = self.api_key
 
         try:
-            active_prompt = config_module.config.get("active_prompt", "analyze") if config_module else "analyze"
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                files = {'file': ('image.jpg', img_data, 'image/jpeg')}
-                params = {'api_key': api_key, 'id': workflow_id, 'prompt': active_prompt}
-                
-                response = await client.post(
-                    f"{self.api_base_url.rstrip('/')}/api/analyze",
-                    files=files,
-                    params=params
-                )
-                
-                if response.status_code == 200:
-                    return response.content, None
-                else:
-                    try:
-                        error_data = response.json()
-                        error_msg = error_data.get("message", response.text)
-                    except:
-                        error_msg = response.text
-                    print(f"API Error: {response.status_code} - {error_msg}")
-                    return None, f"API {response.status_code}: {error_msg}"
+            active_prompt = prompt or self.active_prompt
+            http = self.manager.http
+            files = {'file': ('image.jpg', img_data, 'image/jpeg')}
+            params = {'api_key': api_key, 'id': workflow_id, 'prompt': active_prompt}
+            extensions = {"trace": httpx_trace(trace)} if trace else None
+            if trace:
+                trace.mark("request")
+
+            if audio_buffer is not None:
+                async with http.stream("POST", "/api/analyze", files=files, params=params, extensions=extensions) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        error_msg = self.api_error_message(response)
+                        print(f"API Error: {response.status_code} - {error_msg}")
+                        return None, f"API {response.status_code}: {error_msg}", response.status_code >= 500
+
+                    length = response.headers.get("content-length")
+                    if length and length.isdigit() and "content-encoding" not in response.headers:
+                        audio_buffer.expected_size = int(length)
+                    async for chunk in response.aiter_bytes():
+                        if trace:
+                            trace.mark("first_byte")
+                        audio_buffer.append(chunk)
+                    audio_buffer.finish()
+                    if trace:
+                        trace.mark("downloaded")
+                    return audio_buffer.view(), None, False
+            
+            response = await http.request(
+                "POST",
+                "/api/analyze",
+                files=files,
+                params=params,
+                extensions=extensions
+            )
+            if trace:
+                # The body was read in one go, so download starts with the headers
+                trace.mark("first_byte")
+                trace.mark("downloaded")
+            
+            if response.status_code == 200:
+                return response.content, None, False
+            else:
+                error_msg = self.api_error_message(response)
+                print(f"API Error: {response.status_code} - {error_msg}")
+                return None, f"API {response.status_code}: {error_msg}", response.status_code >= 500
         except asyncio.CancelledError:
             print(f"Analyze request {workflow_id} was cancelled locally.")
             raise
         except Exception as e:
             print(f"Analyze error: {e}")
-            return None, str(e)
+            return None, str(e) or e.__class__.__name__, is_transient_error(e)
+        finally:
+            # Never leave the mixer waiting on a download that has ended
+            if audio_buffer is not None and not audio_buffer.finished:
+                audio_buffer.abort()
+            if trace:
+                trace.spans_from_marks(HTTP_STAGES)
 
     async def cancel_remote_request(self, workflow_id):
         """Tells the web server to stop processing a specific request"""
@@ -167,119 +232,310 @@ class VisionModule(BaseModule):
         
         print(f"Sending cancellation signal for {workflow_id}...")
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.post(f"{self.api_base_url.rstrip('/')}/api/analyze/cancel", params={'id': workflow_id})
+            await self.manager.http.request("POST", "/api/analyze/cancel", params={'id': workflow_id})
         except Exception as e:
             print(f"Failed to send cancellation to web side: {e}")
 
     async def process_workflow(self):
-        if self.is_processing:
-            return
-            
-        config_module = self.manager.modules.get("config")
-        api_key = config_module.config.get("api_key") if config_module else None
-        
-        if not self.api_base_url or not api_key:
+        """Queues a capture and waits until its answer has been spoken.
+
+        Jobs are prepared (capture, upload, download) as soon as they are
+        queued, so job N+1 is on its way while job N is still speaking.
+        """
+        if not self.api_base_url or not self.api_key:
             await self.notify("Operation Aborted: Please configure Base URL and API Key in settings.", "warning")
-            return
-        
-        self.is_processing = True
-        self.cancel_workflow = False
-        self.has_error = False
-        self.workflow_finished = False
-        self.current_workflow_id = str(uuid.uuid4())
-        
-        await self.update_status("Starting Process...", "camera", has_error=False, finished=False)
-        await self.notify("Vision process initiated", "info")
-
-        # Step 1: Taking Photo
-        if self.cancel_workflow: return await self.reset_states()
-        await self.update_status("Capturing image...", "camera")
-        loop = asyncio.get_event_loop()
-        photo = await loop.run_in_executor(None, self.take_a_photo)
+            return None
+
+        max_queue = self.max_queue
+        if len(self.jobs) >= max_queue:
+            await self.notify(f"Queue Full: {max_queue} questions are already in progress", "warning")
+            return None
         
-        if photo:
-            buffered = io.BytesIO()
-            photo.save(buffered, format="JPEG")
-            self.last_image = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            await self.update_status("Image captured and processed", "camera")
-            await self.notify("Scene captured: Processing frame for AI analysis", "info")
+        job = WorkflowJob()
+        self.manager.metrics.memory.track(job.trace)
+        self.jobs.append(job)
+        position = len(self.jobs)
+
+        await self.update_status("Starting Process...", "camera", has_error=False, finished=False, job=job)
+        if position == 1:
+            await self.notify("Vision process initiated", "info")
+        else:
+            await self.notify(f"Vision process queued at position {position}", "info")
 
-        if self.cancel_workflow: return await self.reset_states()
-        if not photo:
-            self.is_processing = False
-            await self.update_status("Camera Error: Failed to capture image", has_error=True)
-            await self.notify("Camera error: Failed to capture", "warning")
-            return
+        job.prepare_task = self.create_task(self.prepare_job(job), "prepare_job")
+        if self.player_task is None or self.player_task.done():
+            self.player_task = self.create_task(self.run_player(), "player")
 
-        # Step 2: Analyzing
-        await self.update_status("Analyzing via AI...", "ai")
-        
-        self.analysis_task = asyncio.create_task(self.image_to_speech(photo, self.current_workflow_id))
-        
+        await job.done.wait()
+        return job
+
+    async def prepare_job(self, job):
+        """Captures and analyzes one job; sets job.ready once it can be spoken"""
         try:
-            audio_data, error_msg = await self.analysis_task
-            self.analysis_task = None
-        except asyncio.CancelledError:
-            print("AI analysis task cancelled.")
-            return # reset_states will be called by whatever cancelled it
+            # Step 1: Taking Photo
+            async with self.capture_lock:
+                job.state = "capturing"
+                await self.update_status("Capturing image...", "camera", job=job)
+                with job.trace.span("capture"):
+                    photos = await self.take_a_photo(job)
+
+            frame = None
+            if photos:
+                runtime = self.manager.runtime
+                frames = photos
+                if runtime.image_processes:
+                    # Copied once; the process pool workers attach instead of unpickling frames
+                    with job.trace.span("handoff"):
+                        frames = await runtime.run("io", SharedFrames, photos)
+                try:
+                    best = 0
+                    quality = self.quality
+                    if quality["enabled"]:
+                        # Blurry or badly exposed frames would waste a full AI round trip
+                        try:
+                            with job.trace.span("score"):
+                                best, scores = await runtime.run("image", score_frames, frames, quality)
+                        except Exception as e:
+                            print(f"Quality check error: {e}")
+                            best, scores = 0, None
+                        if scores:
+                            print(f"Frame scores: {[(score['sharpness'], score['clipped']) for score in scores]}")
+                        if best is None:
+                            return await self.reject_capture(job, scores)
+                        job.quality = scores[best] if scores else None
+
+                    # Encoded once off the loop; upload and preview share these bytes
+                    try:
+                        with job.trace.span("encode"):
+                            frame = await runtime.run("image", prepare_frame, frames, best, self.preprocess)
+                    except Exception as e:
+                        print(f"Preprocess error: {e}")
+                finally:
+                    if isinstance(frames, SharedFrames):
+                        frames.release()
+
+            if not frame:
+                return await self.fail_job(job, "Camera Error: Failed to capture image", "Camera error: Failed to capture")
+
+            # The bytes live in the asset store; the job keeps the ID and the metadata
+            job.image = self.keep_asset(job, frame["data"], "image/jpeg")
+            job.frame = {key: value for key, value in frame.items() if key != "data"}
+            print(f"Frame prepared: {frame['width']}x{frame['height']}, q={frame['quality']}, {frame['size'] // 1024} KB")
+            await self.update_status("Image captured and processed", "camera", job=job)
+            await self.notify("Scene captured: Processing frame for AI analysis", "info")
 
-        if audio_data:
-            self.last_audio = base64.b64encode(audio_data).decode('utf-8')
-            await self.update_status("AI analysis received", "ai")
+            # Step 2: Analyzing, unless this page was answered recently
+            active_prompt = self.active_prompt
+            cache = self.manager.response_cache
+            with job.trace.span("cache_lookup"):
+                cached_audio = await cache.lookup(frame["hash"], active_prompt)
+            self.manager.metrics.inc("vgas_cache_lookups_total", {"result": "hit" if cached_audio else "miss"})
+            if cached_audio:
+                job.audio = self.keep_asset(job, cached_audio, "audio/mpeg")
+                job.state = "ready"
+                await self.update_status("Answer found in cache", "ai", job=job)
+                await self.notify("Cache Hit: Replaying the saved answer for this page", "success")
+                job.trace.mark("ready")
+                job.ready.set()
+                return
+
+            job.state = "analyzing"
+            await self.update_status("Analyzing via AI...", "ai", job=job)
+
+            if self.stream_audio:
+                job.audio_buffer = AudioStreamBuffer(self.prebuffer_bytes)
+            job.analysis_task = asyncio.create_task(
+                self.image_to_speech(frame["data"], job.id, job.audio_buffer, trace=job.trace)
+            )
+
+            if job.audio_buffer is not None:
+                # Playable as soon as the prebuffer has arrived
+                await job.audio_buffer.ready.wait()
+                if job.audio_buffer.size and not job.audio_buffer.aborted:
+                    job.state = "ready"
+                    await self.update_status("AI analysis streaming", "ai", job=job)
+                    job.trace.mark("ready")
+                    job.ready.set()
+
+            audio_data, error_msg, retryable = await job.analysis_task
+            job.analysis_task = None
+            if not audio_data and retryable:
+                entry = await self.manager.spool.add(frame["data"], {
+                    "prompt": active_prompt,
+                    "hash": frame["hash"],
+                    "station": self.id
+                })
+                if entry:
+                    return await self.spool_job(job, error_msg)
+            if not audio_data:
+                return await self.fail_job(job, f"AI Error: {error_msg}", f"AI analysis failed: {error_msg}")
+
+            job.audio = self.keep_asset(job, audio_data, "audio/mpeg")
+            await cache.store(frame["hash"], active_prompt, audio_data)
+            if job.state == "playing":
+                # Finished downloading while speaking; only publish the new asset
+                await self.update_status(job.status, job=job)
+            else:
+                job.state = "ready"
+                await self.update_status("AI analysis received", "ai", job=job)
             await self.notify("AI Analysis: Insights successfully received from engine", "success")
-
-        if self.cancel_workflow: return await self.reset_states()
-        if not audio_data:
-            self.is_processing = False
-            await self.update_status(f"AI Error: {error_msg}", has_error=True)
-            await self.notify(f"AI analysis failed: {error_msg}", "warning")
+            job.trace.mark("ready")
+            job.ready.set()
+        except asyncio.CancelledError:
+            print(f"Workflow {job.id} preparation cancelled.")
+            raise
+        except Exception as e:
+            print(f"Workflow {job.id} error: {e}")
+            await self.fail_job(job, f"Workflow Error: {e}", f"Vision process failed: {e}")
+
+    def keep_asset(self, job, data, media_type):
+        """Stores a job's image or answer, pinned until the job ends"""
+        asset_id = self.manager.assets.put(data, media_type, pin=True)
+        job.assets.append(asset_id)
+        return asset_id
+
+    def release_assets(self, job):
+        for asset_id in job.assets:
+            self.manager.assets.unpin(asset_id)
+        job.assets = []
+
+    async def fail_job(self, job, status, message):
+        job.state = "failed"
+        self.manager.metrics.inc("vgas_workflow_errors_total", {"step": job.step})
+        await self.update_status(status, has_error=True, job=job)
+        await self.notify(message, "warning")
+        job.ready.set()
+
+    async def reject_capture(self, job, scores):
+        """Every frame of the burst failed the quality check; ask for a retake"""
+        reason = max(scores, key=lambda score: score["sharpness"])["reason"]
+        hints = {
+            "blurry": "Image is blurry: hold the page still and press again",
+            "too dark": "Image is too dark: add some light and press again",
+            "too bright": "Image is overexposed: avoid glare and press again",
+        }
+        hint = hints.get(reason, "Image quality too low: please try again")
+        job.quality = max(scores, key=lambda score: score["sharpness"])
+        await self.fail_job(job, hint, f"Capture rejected ({reason}): {hint}")
+
+    async def spool_job(self, job, error_msg):
+        job.state = "spooled"
+        await self.update_status("Offline: Question saved, it will be sent when the server is reachable", "ai", job=job)
+        await self.notify(f"Server unreachable ({error_msg}): Question saved for automatic retry", "warning")
+        job.ready.set()
+
+    async def send_spooled(self, data, entry):
+        return await self.image_to_speech(data, entry["id"], prompt=entry.get("prompt"))
+
+    async def on_spool_result(self, entry, data, audio, error):
+        """Publishes answers to questions that were spooled while offline"""
+        if not audio:
+            await self.notify(f"Saved question dropped: {error}", "warning")
             return
 
-        # Step 3: Audio Playback
-        await self.notify("Audio Response: AI is speaking the report", "info")
-        await self.play_audio(audio_data)
-
-        # Finished
-        if not self.cancel_workflow:
-            self.is_processing = False
-            self.workflow_finished = True
-            await self.update_status("Analysis Completed Successfully", "idle", finished=True)
+        await self.manager.response_cache.store(entry.get("hash"), entry.get("prompt"), audio)
+        self.spool_results.appendleft({
+            "id": entry["id"],
+            "image": self.manager.assets.put(data, "image/jpeg"),
+            "audio": self.manager.assets.put(audio, "audio/mpeg"),
+            "prompt": entry.get("prompt"),
+            "time": time.strftime("%H:%M:%S")
+        })
+        await self.manager.publish_state(self.channel, self.get_state())
+        await self.notify("Saved question answered: Listen to it from the dashboard", "success")
+
+    async def run_player(self):
+        """Speaks prepared jobs strictly in press order"""
+        while self.jobs:
+            job = self.jobs[0]
+            await self.manager.publish_state(self.channel, self.get_state())
+            await job.ready.wait()
+
+            # Step 3: Audio Playback
+            if not job.is_final:
+                job.state = "playing"
+                await self.notify("Audio Response: AI is speaking the report", "info")
+                # The complete answer once downloaded, otherwise the stream still arriving
+                audio = self.manager.assets.view(job.audio) if job.audio else None
+                source = audio if audio is not None else job.audio_buffer
+                if source is None:
+                    await self.fail_job(job, "Audio Error: The answer is no longer available", "Audio playback failed: answer missing")
+                else:
+                    await self.play_audio(source, job)
+
+            # A streamed answer may still be downloading after playback stops
+            if job.prepare_task:
+                await asyncio.gather(job.prepare_task, return_exceptions=True)
+            await self.finish_job(job)
+
+    async def finish_job(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+        # last_job outlives playback; let the asset store own the answer from here
+        job.audio_buffer = None
+        self.release_assets(job)
+
+        if job.state in ("ready", "playing"):
+            job.state = "done"
+            self.last_job = job
+            await self.update_status("Analysis Completed Successfully", "idle", finished=True, job=job)
             await self.notify("Operation Finished: Full cycle completed successfully", "success")
         else:
-            await self.reset_states()
+            if job.state in ("failed", "spooled"):
+                self.last_job = job
+            await self.manager.publish_state(self.channel, self.get_state())
+        await self.record_trace(job)
+        job.done.set()
+
+    async def record_trace(self, job):
+        if job.trace.outcome:
+            return # Already recorded, e.g. cancelled while the player held it
+        job.trace.finish(job.state)
+        self.manager.metrics.record_trace(job.trace, job.time_to_first_audio)
+        await self.manager.publish_state("metrics", self.manager.metrics.get_state())
+
+    async def cancel_job(self, job):
+        """Cancels one job locally and on the web server"""
+        if job.is_final:
+            return
+        was_playing = job.state == "playing"
+        job.cancelled = True
+        job.state = "cancelled"
+        job.status = "Cancelled"
+
+        if job.audio_buffer:
+            job.audio_buffer.abort()
+        self.release_assets(job)
+        if was_playing:
+            await self.audio.stop()
+
+        if job.analysis_task and not job.analysis_task.done():
+            job.analysis_task.cancel()
+            asyncio.create_task(self.cancel_remote_request(job.id))
+        if job.prepare_task and not job.prepare_task.done():
+            job.prepare_task.cancel()
+
+        # Free the queue slot now; the player skips it if it already holds it
+        if job in self.jobs:
+            self.jobs.remove(job)
+        self.manager.metrics.inc("vgas_workflow_cancellations_total")
+        await self.record_trace(job)
+        job.ready.set()
+        job.done.set()
 
     async def reset_states(self):
-        print(f"Resetting vision states. Current ID: {self.current_workflow_id}")
-        
-        # 1. Signal local cancellation
-        self.cancel_workflow = True
-        
-        # 2. Cancel the analysis task if running
-        if self.analysis_task and not self.analysis_task.done():
-            self.analysis_task.cancel()
-            
-        # 3. Propagate to web server
-        if self.current_workflow_id:
-            asyncio.create_task(self.cancel_remote_request(self.current_workflow_id))
+        print(f"Resetting vision states. Active jobs: {len(self.jobs)}")
 
-        # 4. Stop audio
-        pygame.mixer.music.stop()
-        
-        self.is_processing = False
-        self.audio_state = "idle"
-        self.cancel_workflow = False
-        self.has_error = False
-        self.workflow_finished = False
-        self.stop_audio_event = True
-        self.current_step = "idle"
-        self.status_message = "System Standby - Ready for Command"
-        self.last_image = None
-        self.last_audio = None
-        self.current_workflow_id = None
-        self.analysis_task = None
+        # Cancel every queued job, locally and on the web server
+        jobs = list(self.jobs)
+        self.jobs.clear()
+        for job in jobs:
+            await self.cancel_job(job)
+
+        await self.audio.stop()
+        self.last_job = None
         
-        await self.update_status(self.status_message, self.current_step)
+        await self.update_status(self.IDLE_STATUS, "idle")
 
     async def execute_command(self, command, data=None):
         print(f"Vision command received: {command}")
@@ -287,24 +543,29 @@ class VisionModule(BaseModule):
             asyncio.create_task(self.process_workflow())
             return {"status": "triggered"}
             
+        if command == "cancel_job":
+            workflow_id = (data or {}).get("workflow_id")
+            job = next((job for job in self.jobs if job.id == workflow_id), None)
+            if not job:
+                return {"error": "Unknown workflow"}
+            await self.cancel_job(job)
+            await self.manager.publish_state(self.channel, self.get_state())
+            await self.notify("Workflow cancelled: Question removed from the queue", "info")
+            return {"status": "cancelled", "workflow_id": workflow_id}
+
         if command == "audio_pause":
-            if self.audio_state == "playing":
-                pygame.mixer.music.pause()
-                self.audio_state = "paused"
+            if await self.audio.pause():
                 await self.update_status("Speaking Paused", "audio")
-            return {"status": self.audio_state}
+            return {"status": self.audio.state}
             
         if command == "audio_resume":
-            if self.audio_state == "paused":
-                pygame.mixer.music.unpause()
-                self.audio_state = "playing"
+            if await self.audio.resume():
                 await self.update_status("Speaking...", "audio")
-            return {"status": self.audio_state}
+            return {"status": self.audio.state}
             
         if command == "audio_stop":
-            self.audio_state = "idle"
-            pygame.mixer.music.stop()
-            await self.update_status("Audio Stopped", self.current_step)
+            await self.audio.stop()
+            await self.update_status("Audio Stopped")
             await self.notify("Audio Playback: Aborted by user", "warning")
             return {"status": "stopped"}
 
@@ -313,56 +574,187 @@ class VisionModule(BaseModule):
             await self.notify("System Reset: Engine and assets cleared", "info")
             return {"status": "reset"}
 
-        if command == "audio_backward":
-            try:
-                pygame.mixer.music.play()
-                await self.update_status("Restarting Speech...", "audio")
-            except: pass
-            return {"status": "restarted"}
-
-        if command == "audio_forward":
-            try:
-                # Pygame get_pos() returns ms since play() started.
-                # set_pos() works in seconds for most formats.
-                current_time = pygame.mixer.music.get_pos() / 1000.0
-                pygame.mixer.music.set_pos(current_time + 10.0)
-                await self.update_status("Skipping Forward...", "audio")
-            except: pass
-            return {"status": "forwarded"}
+        if command in ("audio_backward", "audio_forward", "audio_restart", "audio_seek"):
+            return await self.seek_audio(command, data or {})
 
         return {"error": "Unknown command"}
 
+    async def seek_audio(self, command, data):
+        """Steps back or forward by the configured seek step, restarts, or
+        seeks to {"seconds": s} or by {"steps": n}"""
+        if command == "audio_restart":
+            position = await self.audio.seek(0)
+        elif command == "audio_seek" and "seconds" in data:
+            position = await self.audio.seek(float(data["seconds"]))
+        else:
+            steps = {"audio_backward": -1, "audio_forward": 1}.get(command, data.get("steps", 0))
+            position = await self.audio.skip(float(steps))
+        if position is None:
+            return {"status": self.audio.state}
+        return {"status": self.audio.state, "position": round(position, 2)}
+
     def get_state(self):
         """Returns the current state for syncing with new clients"""
+        job = self.view_job()
         return {
-            "status": self.status_message,
-            "step": self.current_step,
+            "status": job.status if job else self.idle_status,
+            "step": job.step if job else "idle",
             "is_processing": self.is_processing,
-            "audio_state": self.audio_state,
-            "has_error": self.has_error,
-            "workflow_finished": self.workflow_finished,
+            "audio_state": self.audio.state,
+            "has_error": job.has_error if job else False,
+            "workflow_finished": job.finished if job else False,
+            "workflow_id": job.id if job else None,
+            "metrics": {
+                "capture_ms": job.capture_ms if job else None,
+                "sharpness": job.quality["sharpness"] if job and job.quality else None,
+                "time_to_first_audio": job.time_to_first_audio if job else None
+            },
             "assets": {
-                "image": self.last_image,
-                "audio": self.last_audio
-            }
+                "image": job.image if job else None,
+                "audio": job.audio if job else None
+            },
+            "queue": [queued.summary() for queued in self.jobs],
+            "spool_results": list(self.spool_results),
+            "max_queue": self.max_queue
+        }
+
+    def get_button_config(self):
+        """This station's buttons, defaulting to a single desk button.
+
+        The default maps only press, so it fires on the press edge; mapping
+        long_press or double_press (e.g. reset_vision, audio_backward) makes
+        every press wait for the release or the double-press window."""
+        if self.id == "default":
+            buttons = self.manager.config.get_list("buttons")
+        else:
+            buttons = self.settings.get("buttons")
+        return buttons or [{
+            "pin": self.settings.get("button_pin", self.BUTTON_PIN),
+            "press": "trigger_vision"
+        }]
+
+    def summary(self):
+        """Entry in the station list the dashboard picks from"""
+        return {
+            "id": self.id,
+            "name": self.label,
+            "channel": self.channel,
+            "audio_channel": self.audio_channel,
+            "camera": self.camera,
+            "queued": len(self.jobs)
         }
 
     async def start(self):
-        print("Vision module started")
-        while True:
-            # Check physical button button state
-            if IS_PI:
-                try:
-                    if GPIO.input(self.BUTTON_PIN) == GPIO.LOW:
-                        await self.process_workflow()
-                        await asyncio.sleep(2) # Debounce/Wait
-                except:
-                    pass
-            
-            await asyncio.sleep(0.1)
+        await self.audio.start()
+        await self.on_audio_update(self.audio.get_state())
+        await self.manager.publish_state(self.channel, self.get_state())
 
     async def stop(self):
-        if IS_PI:
-            GPIO.cleanup()
+        self.manager.config.unsubscribe(self.apply_config)
+        await self.audio.stop()
+        self.audio.close()
+
+class VisionModule(BaseModule):
+    """Runs a Station per desk from the stations config list. Without one,
+    a single "default" station uses the top-level keys and the vision and
+    audio channels, exactly like a one-desk controller."""
 
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.stations = {} # id -> Station, in config order
+        for settings in self.station_configs():
+            self.stations[settings["id"]] = Station(self, settings["id"], settings)
+        self.buttons = None
+        self.button_stations = {} # pin -> Station
+
+    def station_configs(self):
+        entries = self.manager.config.get_list("stations")
+        configs = []
+        for index, entry in enumerate(entries or []):
+            if not isinstance(entry, dict):
+                continue
+            entry = {**entry, "id": str(entry.get("id") or f"station{index + 1}")}
+            if entry["id"] in [config["id"] for config in configs]:
+                print(f"Duplicate station id {entry['id']}, skipping")
+                continue
+            if "base_url" in entry:
+                print(f"Station {entry['id']}: base_url cannot differ per station, using the shared one")
+            configs.append(entry)
+        return configs or [{"id": "default"}]
+
+    @property
+    def multi_station(self):
+        return "default" not in self.stations
+
+    @property
+    def default_station(self):
+        return next(iter(self.stations.values()))
+
+    def get_station(self, data=None):
+        station_id = (data or {}).get("station")
+        return self.stations.get(station_id) if station_id else self.default_station
+
+    async def execute_command(self, command, data=None):
+        """Station commands, routed by data["station"] (the first station if omitted)"""
+        if command == "list_stations":
+            return {"stations": [station.summary() for station in self.stations.values()]}
+        station = self.get_station(data)
+        if not station:
+            return {"error": f"Unknown station {data.get('station')}"}
+        return await station.execute_command(command, data)
+
+    def get_state(self):
+        if not self.multi_station:
+            return self.default_station.get_state()
+        # Each station publishes its own vision/<id> channel; this one lists them
+        return {"stations": [station.summary() for station in self.stations.values()]}
+
+    async def on_button_gesture(self, command, pin, gesture):
+        station = self.button_stations.get(pin)
+        if station:
+            print(f"Button {pin} ({station.id}) {gesture}: {command}")
+            await station.execute_command(command)
+
+    async def send_spooled(self, data, entry):
+        station = self.stations.get(entry.get("station")) or self.default_station
+        return await station.send_spooled(data, entry)
+
+    async def on_spool_result(self, entry, data, audio, error):
+        station = self.stations.get(entry.get("station")) or self.default_station
+        await station.on_spool_result(entry, data, audio, error)
+
+    def claim_mixer(self):
+        """pygame's mixer exists once per process; later stations asking for it stay silent"""
+        owner = None
+        for station in self.stations.values():
+            if station.audio.settings["sink"] != "pygame":
+                continue
+            if owner:
+                print(f"Station {station.id}: the pygame mixer belongs to {owner.id}, use the process sink for a second speaker")
+                station.audio.settings["sink"] = "none"
+            else:
+                owner = station
 
+    async def start(self):
+        self.claim_mixer()
+        await asyncio.gather(*(station.start() for station in self.stations.values()))
+        print(f"Vision module started with {len(self.stations)} station(s)")
+
+        buttons = []
+        for station in self.stations.values():
+            for button in station.get_button_config():
+                if button["pin"] in self.button_stations:
+                    print(f"Pin {button['pin']} of station {station.id} is already used by {self.button_stations[button['pin']].id}")
+                    continue
+                self.button_stations[button["pin"]] = station
+                buttons.append(button)
+        self.buttons = ButtonInput(buttons, self.on_button_gesture, self.manager.config.get_dict("button_timing"))
+        self.buttons.start(asyncio.get_running_loop())
+        self.manager.spool.start(self.send_spooled, self.on_spool_result)
+
+    async def stop(self):
+        await asyncio.gather(*(station.stop() for station in self.stations.values()))
+        if self.buttons:
+            self.buttons.stop()
+        if IS_PI:
+            GPIO.cleanup()
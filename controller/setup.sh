@@ -11,7 +11,8 @@ sudo apt-get install -y git python3-pip python3-venv python3-dev \
     network-manager curl \
     libjpeg-dev zlib1g-dev \
     libsdl2-2.0-0 libsdl2-mixer-2.0-0 \
-    portaudio19-dev
+    portaudio19-dev \
+    python3-picamera2
 
 echo "--- [2/6] Wifi-Connect (Captive Portal) kuruluyor ---"
 # Wifi-connect, cihazın Wi-Fi ayarlarını telefon üzerinden yapmanızı sağlar
@@ -44,8 +45,9 @@ fi
 cd $PROJECT_DIR/vgas/controller
 
 # Sanal ortam oluşturma
+# picamera2 apt ile kurulur; sanal ortamın görebilmesi için sistem paketleri açık
 if [ ! -d "venv" ]; then
-    python3 -m venv venv
+    python3 -m venv --system-site-packages venv
 fi
 
 # Bağımlılıkları yükle